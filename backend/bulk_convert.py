@@ -0,0 +1,204 @@
+# backend/bulk_convert.py
+"""
+Converts every PDF in a local directory or S3 prefix to Markdown in parallel.
+
+Usage:
+    python bulk_convert.py ./course_pdfs
+    python bulk_convert.py s3://my-bucket/Lectures/ --workers 8 --manifest lectures.json
+
+Finished and failed files are recorded in a manifest so an interrupted run can be resumed
+by running the same command again. PDFs whose Markdown already exists in S3 are skipped.
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import boto3
+import fitz
+from dotenv import load_dotenv
+
+# Load credentials before the convertor creates its S3 client (also in spawned workers)
+load_dotenv()
+
+from pdf_markdown_convertor import markdown_exists, pdf_to_markdown_s3
+
+DEFAULT_MANIFEST = "bulk_manifest.json"
+
+
+def list_pdfs(source):
+    """Lists the PDFs under a local directory or an s3://bucket/prefix."""
+    if source.startswith("s3://"):
+        bucket, _, prefix = source[len("s3://"):].partition("/")
+        s3 = boto3.client("s3", region_name=os.getenv("AWS_DEFAULT_REGION", "us-east-2"))
+        paginator = s3.get_paginator("list_objects_v2")
+        pdfs = []
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                if obj["Key"].lower().endswith(".pdf"):
+                    pdfs.append(f"s3://{bucket}/{obj['Key']}")
+        return sorted(pdfs)
+
+    pdfs = []
+    for root, _, files in os.walk(source):
+        for name in files:
+            if name.lower().endswith(".pdf"):
+                pdfs.append(os.path.join(root, name))
+    return sorted(pdfs)
+
+
+def markdown_name(source):
+    """Markdown filename a PDF converts to; only the base name is used, as in the API."""
+    return os.path.splitext(os.path.basename(source))[0] + ".md"
+
+
+def find_name_collisions(pdfs):
+    """
+    Maps each PDF whose Markdown name is shared with another PDF in the run (e.g.
+    week1/lecture.pdf and week2/lecture.pdf) to an error message. Such files would
+    overwrite each other's Markdown and images, so none of them is converted.
+    """
+    by_name = {}
+    for pdf in pdfs:
+        by_name.setdefault(markdown_name(pdf), []).append(pdf)
+    collisions = {}
+    for name, sources in by_name.items():
+        if len(sources) > 1:
+            for pdf in sources:
+                others = ", ".join(other for other in sources if other != pdf)
+                collisions[pdf] = f"Duplicate name: {name} would also be written by {others}"
+    return collisions
+
+
+def load_manifest(path):
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {"completed": {}, "failed": {}}
+
+
+def save_manifest(manifest, path):
+    """Writes the manifest atomically so an interrupted run never leaves it half-written."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def convert_one(source):
+    """
+    Converts a single PDF (local path or s3:// URI). Runs in a worker process.
+    Returns a result dict; exceptions are propagated to the parent.
+    """
+    started = time.monotonic()
+    original_filename = os.path.basename(source)
+    markdown_filename = markdown_name(source)
+
+    if markdown_exists(markdown_filename):
+        return {"status": "skipped", "markdown_filename": markdown_filename, "pages": 0}
+
+    tmp_path = None
+    try:
+        if source.startswith("s3://"):
+            bucket, _, key = source[len("s3://"):].partition("/")
+            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
+                tmp_path = tmp.name
+            boto3.client("s3", region_name=os.getenv("AWS_DEFAULT_REGION", "us-east-2")).download_file(
+                bucket, key, tmp_path
+            )
+            pdf_path = tmp_path
+        else:
+            pdf_path = source
+
+        with fitz.open(pdf_path) as doc:
+            page_count = len(doc)
+
+        markdown_url = pdf_to_markdown_s3(pdf_path=pdf_path, original_filename=original_filename)
+        if not markdown_url:
+            raise RuntimeError("Markdown upload to S3 failed")
+    finally:
+        if tmp_path:
+            os.remove(tmp_path)
+
+    return {
+        "status": "converted",
+        "markdown_url": markdown_url,
+        "pages": page_count,
+        "seconds": round(time.monotonic() - started, 2),
+    }
+
+
+def bulk_convert(source, workers=None, manifest_path=DEFAULT_MANIFEST, retry_failed=False):
+    """Converts all PDFs under source with a process pool, updating the manifest as files finish."""
+    manifest = load_manifest(manifest_path)
+    pdfs = list_pdfs(source)
+    todo = [
+        pdf for pdf in pdfs
+        if pdf not in manifest["completed"] and (retry_failed or pdf not in manifest["failed"])
+    ]
+    print(f"Found {len(pdfs)} PDFs, {len(pdfs) - len(todo)} already handled, {len(todo)} to process")
+
+    converted = skipped = failed = pages = 0
+
+    collisions = find_name_collisions(pdfs)
+    for pdf in [pdf for pdf in todo if pdf in collisions]:
+        failed += 1
+        manifest["failed"][pdf] = collisions[pdf]
+        todo.remove(pdf)
+        print(f"FAILED   {pdf}: {collisions[pdf]}")
+    if collisions:
+        save_manifest(manifest, manifest_path)
+    started = time.monotonic()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(convert_one, pdf): pdf for pdf in todo}
+        for future in as_completed(futures):
+            pdf = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                failed += 1
+                manifest["failed"][pdf] = str(e)
+                print(f"FAILED   {pdf}: {e}")
+            else:
+                manifest["completed"][pdf] = result
+                manifest["failed"].pop(pdf, None)
+                if result["status"] == "skipped":
+                    skipped += 1
+                    print(f"SKIPPED  {pdf} ({result['markdown_filename']} already exists)")
+                else:
+                    converted += 1
+                    pages += result["pages"]
+                    print(f"DONE     {pdf} ({result['pages']} pages, {result['seconds']}s)")
+            save_manifest(manifest, manifest_path)
+
+    elapsed = time.monotonic() - started
+    docs_per_minute = converted / (elapsed / 60) if elapsed > 0 else 0.0
+    pages_per_second = pages / elapsed if elapsed > 0 else 0.0
+    print(
+        f"\nConverted {converted}, skipped {skipped}, failed {failed} in {elapsed:.1f}s "
+        f"({docs_per_minute:.1f} docs/minute, {pages_per_second:.2f} pages/second)"
+    )
+    return {
+        "converted": converted,
+        "skipped": skipped,
+        "failed": failed,
+        "elapsed_seconds": elapsed,
+        "docs_per_minute": docs_per_minute,
+        "pages_per_second": pages_per_second,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk convert PDFs to Markdown and upload them to S3.")
+    parser.add_argument("source", help="Local directory or s3://bucket/prefix containing PDFs")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST, help="Resumable progress manifest (JSON)")
+    parser.add_argument("--retry-failed", action="store_true", help="Retry files that failed in a previous run")
+    args = parser.parse_args()
+
+    bulk_convert(args.source, workers=args.workers, manifest_path=args.manifest,
+                 retry_failed=args.retry_failed)
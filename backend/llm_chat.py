@@ -1,12 +1,17 @@
 #backend/llm_chat.py
 
 import os
+import json
+import time
+import hashlib
 import tiktoken
 import litellm
 from dotenv import load_dotenv
 import google.generativeai as genai
 from openai import OpenAI
 import anthropic
+from llm_governor import governed_call, LLMProviderError
+from semantic_cache import answer_cache
 
 # Load API keys from .env file
 load_dotenv()
@@ -21,6 +26,17 @@ litellm.api_key = OPENAI_API_KEY
 # Configure DeepSeek API client
 deepseek_client = OpenAI(api_key=DEEPSEEK_API_KEY, base_url="https://api.deepseek.com")
 
+# Per-call timeout for provider SDK requests, so a stalled provider cannot hold a slot forever
+LLM_PROVIDER_TIMEOUT_SECONDS = float(os.getenv("LLM_PROVIDER_TIMEOUT_SECONDS", "60"))
+
+# Model used by each provider
+LLM_MODELS = {
+    "openai": "gpt-4o-mini-2024-07-18",
+    "gemini": "gemini-1.5-pro-latest",
+    "deepseek": "deepseek-chat",
+    "claude": "claude-3-5-haiku-20241022",
+}
+
 def count_tokens(text: str, model: str) -> int:
     """
     Count tokens using tiktoken if supported.
@@ -61,7 +77,163 @@ User Question:
 Answer the question based solely on the document above.
 """
 
-def get_llm_response(pdf_data: dict, question: str, llm_choice: str) -> str:
+def stream_llm_response(prompt_text: str, llm_choice: str, on_open=None):
+    """
+    Calls the selected LLM in streaming mode and yields the answer text chunk by chunk.
+    Used by llm_router.py so it can measure time-to-first-token and abandon a slow
+    provider. Closing the generator closes the underlying provider stream.
+    on_open, if given, is called with the provider's stream object as soon as it exists so
+    another thread can close it (see close_provider_stream) to cancel a blocked read.
+    """
+    provider = resolve_provider(llm_choice)
+
+    if provider == "openai":
+        response = litellm.completion(
+            model=LLM_MODELS[provider],
+            messages=[{"role": "user", "content": prompt_text}],
+            stream=True,
+            timeout=LLM_PROVIDER_TIMEOUT_SECONDS
+        )
+        if on_open:
+            on_open(response)
+        for chunk in response:
+            text = chunk.choices[0].delta.content
+            if text:
+                yield text
+
+    elif provider == "gemini":
+        genai.configure(api_key=GOOGLE_API_KEY)
+        model = genai.GenerativeModel(LLM_MODELS[provider])
+        response = model.generate_content(prompt_text, stream=True,
+                                          request_options={"timeout": LLM_PROVIDER_TIMEOUT_SECONDS})
+        # No stream object that can be closed from another thread, so on_open is not called;
+        # llm_router never races Gemini against another attempt (UNCANCELLABLE_PROVIDERS)
+        for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+    elif provider == "deepseek":
+        response = deepseek_client.chat.completions.create(
+            model=LLM_MODELS[provider],
+            messages=[
+                {"role": "system", "content": "You are a helpful assistant"},
+                {"role": "user", "content": prompt_text},
+            ],
+            stream=True,
+            timeout=LLM_PROVIDER_TIMEOUT_SECONDS
+        )
+        if on_open:
+            on_open(response)
+        try:
+            for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            response.close()
+
+    elif provider == "claude":
+        client = anthropic.Anthropic(api_key=CLAUDE_API_KEY)
+        with client.messages.stream(
+            model=LLM_MODELS[provider],
+            max_tokens=1024,
+            messages=[{"role": "user", "content": prompt_text}],
+            timeout=LLM_PROVIDER_TIMEOUT_SECONDS
+        ) as stream:
+            if on_open:
+                on_open(stream)
+            for text in stream.text_stream:
+                yield text
+
+    else:
+        raise ValueError(f"LLM choice not recognized: {llm_choice}")
+
+
+def close_provider_stream(response):
+    """
+    Closes a provider stream object from another thread, so a read blocked waiting for
+    tokens fails immediately instead of holding its thread and governor slot.
+    """
+    for target in (response, getattr(response, "completion_stream", None)):
+        close = getattr(target, "close", None)
+        if close is None:
+            continue
+        try:
+            close()
+        except Exception as e:
+            print(f"Error closing provider stream: {e}")
+
+
+def resolve_provider(llm_choice: str) -> str | None:
+    """Maps an LLM choice from the UI to the provider whose rate limits and circuit breaker apply."""
+    choice = llm_choice.lower()
+    if choice == "gpt-4o":
+        return "openai"
+    elif choice == "gemini flash free":
+        return "gemini"
+    elif choice in ["deepseek", "deepseek chat"]:
+        return "deepseek"
+    elif choice in ["claude", "claude-3", "claude-3.5 haiku"]:
+        return "claude"
+    return None
+
+
+def call_llm(prompt_text: str, llm_choice: str) -> str:
+    """
+    Calls the selected LLM once and returns its answer.
+    Provider exceptions are not caught here; llm_governor.py retries and classifies them.
+    """
+    provider = resolve_provider(llm_choice)
+
+    if provider == "openai":
+        response = litellm.completion(
+            model=LLM_MODELS[provider],
+            messages=[{"role": "user", "content": prompt_text}],
+            timeout=LLM_PROVIDER_TIMEOUT_SECONDS
+        )
+        return response["choices"][0]["message"]["content"]
+
+    elif provider == "gemini":
+        genai.configure(api_key=GOOGLE_API_KEY)
+        model = genai.GenerativeModel(LLM_MODELS[provider])
+        response = model.generate_content(prompt_text,
+                                          request_options={"timeout": LLM_PROVIDER_TIMEOUT_SECONDS})
+        return response.text
+
+    elif provider == "deepseek":
+        response = deepseek_client.chat.completions.create(
+            model=LLM_MODELS[provider],
+            messages=[
+                {"role": "system", "content": "You are a helpful assistant"},
+                {"role": "user", "content": prompt_text},
+            ],
+            stream=False,
+            timeout=LLM_PROVIDER_TIMEOUT_SECONDS
+        )
+        return response.choices[0].message.content
+
+    elif provider == "claude":
+        client = anthropic.Anthropic(api_key=CLAUDE_API_KEY)
+        response = client.messages.create(
+            model=LLM_MODELS[provider],
+            max_tokens=1024,
+            messages=[{"role": "user", "content": prompt_text}],
+            timeout=LLM_PROVIDER_TIMEOUT_SECONDS
+        )
+        return "".join(block.text for block in response.content if block.type == "text")
+
+    else:
+        raise ValueError(f"LLM choice not recognized: {llm_choice}")
+
+
+def document_fingerprint(pdf_data: dict) -> str:
+    """Hash of the document content; cached answers are dropped when it changes."""
+    return hashlib.sha256(json.dumps(pdf_data, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def get_llm_response(pdf_data: dict, question: str, llm_choice: str,
+                     fallback_llms: list[str] | None = None,
+                     hedge_after_seconds: float | None = None,
+                     document_id: str | None = None) -> str:
     """
     Builds a prompt and calls the selected LLM.
     Supports:
@@ -69,58 +241,41 @@ def get_llm_response(pdf_data: dict, question: str, llm_choice: str) -> str:
       - Gemini Flash Free via google.generativeai
       - DeepSeek Chat via OpenAI API wrapper
       - Claude 3.5 Haiku via Anthropic
+    Calls go through the provider's governor (llm_governor.py); failures raise an
+    LLMProviderError carrying the HTTP status to return.
+    If fallback_llms is given, the request is routed across llm_choice and the
+    fallbacks with hedging (see llm_router.py) instead of calling a single provider.
+    Answers are cached per document (document_id, or the content fingerprint) and reused
+    for similar questions (see semantic_cache.py).
     """
+    if not fallback_llms and resolve_provider(llm_choice) is None:
+        return "LLM choice not recognized."
+
+    fingerprint = document_fingerprint(pdf_data)
+    document_key = document_id or fingerprint
+    llm_choices = [llm_choice] + list(fallback_llms or [])
+    cached_answer = answer_cache.lookup(document_key, fingerprint, question, llm_choices)
+    if cached_answer is not None:
+        return cached_answer
+
     prompt_text = build_prompt(pdf_data, question)
+    started = time.monotonic()
 
-    try:
-        if llm_choice.lower() == "gpt-4o":
-            token_count = count_tokens(prompt_text, model="gpt-4o-mini-2024-07-18")
-            print(f"Token count for prompt: {token_count}")
-
-            response = litellm.completion(
-                model="gpt-4o-mini-2024-07-18",
-                messages=[{"role": "user", "content": prompt_text}]
-            )
-            return response["choices"][0]["message"]["content"]
-
-        elif llm_choice.lower() == "gemini flash free":
-            token_count = count_tokens(prompt_text, model="gemini-1.5-pro-latest")
-            print(f"Token count for prompt (Gemini): {token_count}")
-
-            genai.configure(api_key=GOOGLE_API_KEY)
-            model = genai.GenerativeModel('gemini-1.5-pro-latest')
-            response = model.generate_content(prompt_text)
-            return response.text
-
-        elif llm_choice.lower() in ["deepseek", "deepseek chat"]:
-            token_count = count_tokens(prompt_text, model="deepseek-chat")
-            print(f"Token count for prompt (DeepSeek): {token_count}")
-
-            response = deepseek_client.chat.completions.create(
-                model="deepseek-chat",
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant"},
-                    {"role": "user", "content": prompt_text},
-                ],
-                stream=False
-            )
-            return response.choices[0].message.content
-
-        elif llm_choice.lower() in ["claude", "claude-3", "claude-3.5 haiku"]:
-            token_count = count_tokens(prompt_text, model="claude-3-5-haiku-20241022")
-            print(f"Token count for prompt (Claude 3.5 Haiku): {token_count}")
-
-            client = anthropic.Anthropic(api_key=CLAUDE_API_KEY)
-            response = client.messages.create(
-                model="claude-3-5-haiku-20241022",
-                max_tokens=1024,
-                messages=[{"role": "user", "content": prompt_text}]
-            )
-            return response.content
+    if fallback_llms:
+        from llm_router import route_llm_response
+        answer, answered_by = route_llm_response(prompt_text, llm_choices,
+                                                 hedge_after_seconds=hedge_after_seconds)
+    else:
+        answered_by = llm_choice
+        provider = resolve_provider(llm_choice)
+        token_count = count_tokens(prompt_text, model=LLM_MODELS[provider])
+        print(f"Token count for prompt ({llm_choice}): {token_count}")
 
-        else:
-            return "LLM choice not recognized."
+        try:
+            answer = governed_call(provider, token_count, lambda: call_llm(prompt_text, llm_choice))
+        except LLMProviderError as e:
+            print(f"Error processing request: {e}")
+            raise
 
-    except Exception as e:
-        print(f"Error processing request: {e}")
-        return f"Error: {e}"
+    answer_cache.store(document_key, fingerprint, question, answered_by, answer, time.monotonic() - started)
+    return answer
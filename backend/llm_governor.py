@@ -0,0 +1,422 @@
+# backend/llm_governor.py
+
+import os
+import random
+import threading
+import time
+
+# Per-provider limits, overridable with e.g. LLM_OPENAI_MAX_CONCURRENCY / LLM_OPENAI_TOKENS_PER_MINUTE
+DEFAULT_LIMITS = {
+    "openai": {"max_concurrency": 8, "tokens_per_minute": 200_000},
+    "gemini": {"max_concurrency": 2, "tokens_per_minute": 32_000},
+    "deepseek": {"max_concurrency": 4, "tokens_per_minute": 100_000},
+    "claude": {"max_concurrency": 4, "tokens_per_minute": 50_000},
+}
+
+# Requests allowed to wait for a slot before new ones are rejected
+MAX_QUEUE_DEPTH = int(os.getenv("LLM_MAX_QUEUE_DEPTH", "16"))
+# Longest a request may wait for a concurrency slot or token budget
+MAX_QUEUE_WAIT_SECONDS = float(os.getenv("LLM_MAX_QUEUE_WAIT_SECONDS", "30"))
+
+# Retry settings
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 30.0
+
+# Circuit breaker settings
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_COOLDOWN_SECONDS = float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+
+
+########################################
+#              Exceptions              #
+########################################
+class LLMProviderError(Exception):
+    """An LLM provider call failed; carries the HTTP status the API should return."""
+    status_code = 502
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ProviderRateLimitedError(LLMProviderError):
+    """The provider kept returning 429 after all retries."""
+    status_code = 429
+
+
+class ProviderRequestError(LLMProviderError):
+    """
+    The provider rejected the request itself (e.g. 400 context_length_exceeded, 401): the
+    request is at fault, not the provider's health, so it never trips the circuit breaker.
+    Carries the provider's 4xx status.
+    """
+    status_code = 400
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        if status_code is not None:
+            self.status_code = status_code
+
+
+class ProviderOverloadedError(LLMProviderError):
+    """Too many requests are already queued for this provider."""
+    status_code = 429
+
+
+class ProviderUnavailableError(LLMProviderError):
+    """The provider's circuit breaker is open, or every provider failed."""
+    status_code = 503
+
+
+class ProviderTimeoutError(LLMProviderError):
+    """The provider did not answer in time."""
+    status_code = 504
+
+
+########################################
+#       Provider error inspection      #
+########################################
+def _status_code(e):
+    """Best-effort HTTP status of an exception raised by litellm, openai, anthropic or google."""
+    for attr in ("status_code", "code"):
+        value = getattr(e, attr, None)
+        try:
+            if value is not None:
+                return int(value)
+        except (TypeError, ValueError):
+            pass
+    response = getattr(e, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def _retry_after(e):
+    """Reads the Retry-After header (seconds) from a provider exception, if present."""
+    response = getattr(e, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        value = headers.get("retry-after") or headers.get("Retry-After")
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_timeout(e):
+    return isinstance(e, TimeoutError) or "timeout" in type(e).__name__.lower()
+
+
+def _is_retryable(e):
+    status = _status_code(e)
+    if status is not None:
+        return status in (408, 409, 429) or status >= 500
+    name = type(e).__name__.lower()
+    return _is_timeout(e) or "connection" in name or "ratelimit" in name or "resourceexhausted" in name
+
+
+def _is_rate_limit(e):
+    if isinstance(e, ProviderRateLimitedError) or _status_code(e) == 429:
+        return True
+    name = type(e).__name__.lower()
+    return "ratelimit" in name or "resourceexhausted" in name
+
+
+def _is_client_error(e):
+    """A 4xx other than 408/409/429: retrying or blaming the provider would not help."""
+    status = _status_code(e)
+    return status is not None and 400 <= status < 500 and status not in (408, 409, 429)
+
+
+def _classify(e, provider):
+    """Wraps a raw provider exception into an LLMProviderError with a suitable status."""
+    if isinstance(e, LLMProviderError):
+        return e
+    message = f"{provider} request failed: {e}"
+    if _is_rate_limit(e):
+        return ProviderRateLimitedError(message, retry_after=_retry_after(e))
+    if _is_client_error(e):
+        return ProviderRequestError(message, status_code=_status_code(e))
+    if _is_timeout(e):
+        return ProviderTimeoutError(message)
+    return LLMProviderError(message)
+
+
+########################################
+#            Governor pieces           #
+########################################
+class TokenBucket:
+    """Token-rate limiter refilled continuously at tokens_per_minute."""
+
+    def __init__(self, tokens_per_minute):
+        self.capacity = float(tokens_per_minute)
+        self.tokens = self.capacity
+        self.rate = self.capacity / 60.0
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self, tokens, timeout):
+        """Waits until `tokens` are available; returns False if that would exceed timeout."""
+        tokens = min(float(tokens), self.capacity)
+        deadline = time.monotonic() + timeout
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return True
+                wait = (tokens - self.tokens) / self.rate
+            if time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures, then lets a single trial request through after a cooldown."""
+
+    def __init__(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    def before_call(self, provider):
+        with self.lock:
+            if self.opened_at is None:
+                return
+            remaining = self.opened_at + BREAKER_COOLDOWN_SECONDS - time.monotonic()
+            if remaining > 0 or self.trial_in_flight:
+                raise ProviderUnavailableError(
+                    f"{provider} is temporarily unavailable (circuit open)",
+                    retry_after=max(remaining, 1.0)
+                )
+            # Half-open: allow one trial request
+            self.trial_in_flight = True
+
+    def release_trial(self):
+        """Gives up a half-open trial that ended without a success or failure (e.g. cancelled)."""
+        with self.lock:
+            self.trial_in_flight = False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial_in_flight or self.failures >= BREAKER_FAILURE_THRESHOLD:
+                self.opened_at = time.monotonic()
+            self.trial_in_flight = False
+
+    def state(self):
+        with self.lock:
+            if self.opened_at is None:
+                return "closed"
+            return "half-open" if self.trial_in_flight else "open"
+
+
+class ProviderGovernor:
+    """
+    Concurrency, token-rate and circuit-breaker state for one provider.
+    The concurrency limit adapts: it is halved on a 429 and grows back slowly on success.
+    """
+
+    def __init__(self, provider):
+        limits = DEFAULT_LIMITS.get(provider, {"max_concurrency": 4, "tokens_per_minute": 100_000})
+        prefix = f"LLM_{provider.upper()}_"
+        self.provider = provider
+        self.max_concurrency = int(os.getenv(prefix + "MAX_CONCURRENCY", limits["max_concurrency"]))
+        self.limit = float(self.max_concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+        self.condition = threading.Condition()
+        self.bucket = TokenBucket(int(os.getenv(prefix + "TOKENS_PER_MINUTE", limits["tokens_per_minute"])))
+        self.breaker = CircuitBreaker()
+
+    def acquire(self, estimated_tokens):
+        """Reserves a concurrency slot and token budget, or raises ProviderOverloadedError."""
+        deadline = time.monotonic() + MAX_QUEUE_WAIT_SECONDS
+        with self.condition:
+            if self.in_flight >= int(self.limit) and self.waiting >= MAX_QUEUE_DEPTH:
+                raise ProviderOverloadedError(f"Too many queued requests for {self.provider}",
+                                              retry_after=BACKOFF_BASE_SECONDS)
+            self.waiting += 1
+            try:
+                while self.in_flight >= int(self.limit):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise ProviderOverloadedError(f"Timed out waiting for a {self.provider} slot",
+                                                      retry_after=BACKOFF_BASE_SECONDS)
+                    self.condition.wait(remaining)
+                self.in_flight += 1
+            finally:
+                self.waiting -= 1
+
+        if not self.bucket.acquire(estimated_tokens, max(deadline - time.monotonic(), 0)):
+            self.release()
+            raise ProviderOverloadedError(f"Token rate limit reached for {self.provider}",
+                                          retry_after=estimated_tokens / self.bucket.rate)
+
+    def release(self):
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify()
+
+    def on_success(self, rate_limited=False):
+        """Closes the breaker; the concurrency limit only grows back if no attempt was throttled."""
+        self.breaker.record_success()
+        if rate_limited:
+            return
+        with self.condition:
+            self.limit = min(float(self.max_concurrency), self.limit + 1.0 / self.limit)
+            self.condition.notify_all()
+
+    def on_rate_limited(self):
+        """Halves the concurrency limit after a 429 so retries and new calls back off together."""
+        with self.condition:
+            self.limit = max(1.0, self.limit / 2)
+
+    def on_retryable_error(self, e):
+        """Called for every failed attempt that will be retried; returns True if it was a 429."""
+        if _is_rate_limit(e):
+            self.on_rate_limited()
+            return True
+        return False
+
+    def on_failure(self, e):
+        """
+        Counts a final failure against the breaker only if it says something about the
+        provider's health (5xx, timeouts, connection errors, persistent 429s). A rejected
+        request (ProviderRequestError) only gives up a half-open trial.
+        """
+        if isinstance(e, ProviderRequestError):
+            self.breaker.release_trial()
+            return
+        self.breaker.record_failure()
+        if _is_rate_limit(e):
+            self.on_rate_limited()
+
+    def stats(self):
+        with self.condition:
+            return {
+                "in_flight": self.in_flight,
+                "queued": self.waiting,
+                "concurrency_limit": int(self.limit),
+                "circuit": self.breaker.state(),
+            }
+
+
+_governors = {}
+_governors_lock = threading.Lock()
+
+
+def get_governor(provider: str) -> ProviderGovernor:
+    with _governors_lock:
+        if provider not in _governors:
+            _governors[provider] = ProviderGovernor(provider)
+        return _governors[provider]
+
+
+def get_governor_stats() -> dict:
+    with _governors_lock:
+        governors = dict(_governors)
+    return {provider: governor.stats() for provider, governor in governors.items()}
+
+
+def _backoff_delay(attempt, e):
+    delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt))
+    delay = random.uniform(delay / 2, delay)  # jitter avoids synchronized retry storms
+    retry_after = _retry_after(e)
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+########################################
+#          Governed provider calls     #
+########################################
+def _acquire_slot(governor, provider, estimated_tokens):
+    try:
+        governor.acquire(estimated_tokens)
+    except ProviderOverloadedError:
+        governor.breaker.release_trial()
+        raise
+
+
+def governed_call(provider: str, estimated_tokens: int, fn):
+    """
+    Calls fn() under the provider's governor: circuit breaker, concurrency and token-rate
+    limits, and retries with exponential backoff that honours Retry-After.
+    Each 429 shrinks the concurrency limit at once, and the slot is given up while backing
+    off, so retries queue behind the smaller limit instead of hammering the provider.
+    Raises an LLMProviderError subclass on failure.
+    """
+    governor = get_governor(provider)
+    governor.breaker.before_call(provider)
+    rate_limited = False
+    for attempt in range(MAX_RETRIES + 1):
+        _acquire_slot(governor, provider, estimated_tokens)
+        try:
+            result = fn()
+            governor.on_success(rate_limited)
+            return result
+        except Exception as e:
+            if not (attempt < MAX_RETRIES and _is_retryable(e)):
+                error = _classify(e, provider)
+                governor.on_failure(error)
+                raise error from e
+            rate_limited |= governor.on_retryable_error(e)
+            delay = _backoff_delay(attempt, e)
+            print(f"{provider} call failed ({e}); retrying in {delay:.1f}s")
+        finally:
+            governor.release()
+        time.sleep(delay)
+
+
+def governed_stream(provider: str, estimated_tokens: int, make_stream, cancelled=None):
+    """
+    Streaming counterpart of governed_call. make_stream() must return a fresh generator.
+    Retries only happen before the first chunk; a failure mid-stream is raised as is.
+    Once the optional `cancelled` event is set, errors (e.g. from closing the stream) are
+    neither retried nor counted against the provider.
+    """
+    governor = get_governor(provider)
+    governor.breaker.before_call(provider)
+    rate_limited = False
+    for attempt in range(MAX_RETRIES + 1):
+        if cancelled is not None and cancelled.is_set():
+            governor.breaker.release_trial()
+            return
+        _acquire_slot(governor, provider, estimated_tokens)
+        stream = make_stream()
+        started = False
+        try:
+            for chunk in stream:
+                started = True
+                yield chunk
+            governor.on_success(rate_limited)
+            return
+        except GeneratorExit:
+            governor.breaker.release_trial()
+            raise
+        except Exception as e:
+            if cancelled is not None and cancelled.is_set():
+                governor.breaker.release_trial()
+                raise
+            if started or not (attempt < MAX_RETRIES and _is_retryable(e)):
+                error = _classify(e, provider)
+                governor.on_failure(error)
+                raise error from e
+            rate_limited |= governor.on_retryable_error(e)
+            delay = _backoff_delay(attempt, e)
+            print(f"{provider} stream failed ({e}); retrying in {delay:.1f}s")
+        finally:
+            stream.close()
+            governor.release()
+        time.sleep(delay)
@@ -0,0 +1,275 @@
+# backend/llm_router.py
+
+import os
+import queue
+import threading
+import time
+from collections import deque
+from statistics import median
+
+from llm_chat import stream_llm_response, close_provider_stream, resolve_provider, count_tokens, LLM_MODELS
+from llm_governor import governed_stream, ProviderUnavailableError, ProviderTimeoutError, ProviderRequestError
+
+# Seconds to wait for the first token from a provider before hedging to the next one
+HEDGE_AFTER_SECONDS = float(os.getenv("LLM_HEDGE_AFTER_SECONDS", "5"))
+# Lower bound for a client-supplied hedge delay, so a request cannot start every provider at once
+MIN_HEDGE_AFTER_SECONDS = float(os.getenv("LLM_MIN_HEDGE_AFTER_SECONDS", "1"))
+# Hard limit for a routed request, including hedges
+LLM_REQUEST_TIMEOUT_SECONDS = float(os.getenv("LLM_REQUEST_TIMEOUT_SECONDS", "120"))
+
+# Rolling window used for per-provider latency and error rates
+STATS_WINDOW = 50
+# A provider is considered unhealthy above this error rate (once it has enough samples)
+UNHEALTHY_ERROR_RATE = 0.5
+MIN_SAMPLES_FOR_HEALTH = 3
+
+# Providers whose streams cannot be closed from another thread (stream_llm_response never
+# calls on_open for them). They are never raced against another attempt: a lost hedge would
+# keep holding one of their governor slots until LLM_PROVIDER_TIMEOUT_SECONDS.
+UNCANCELLABLE_PROVIDERS = {"gemini"}
+
+
+class ProviderStats:
+    """Rolling time-to-first-token and error rate for one provider."""
+
+    def __init__(self):
+        self.latencies = deque(maxlen=STATS_WINDOW)
+        self.outcomes = deque(maxlen=STATS_WINDOW)  # True = success, False = error
+
+    def record_success(self, first_token_seconds):
+        self.latencies.append(first_token_seconds)
+        self.outcomes.append(True)
+
+    def record_error(self):
+        self.outcomes.append(False)
+
+    def record_abandoned(self, waited_seconds):
+        """A hedge won before this provider's first token: it took at least waited_seconds."""
+        self.latencies.append(waited_seconds)
+
+    def error_rate(self):
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def median_latency(self):
+        return median(self.latencies) if self.latencies else None
+
+    def is_healthy(self):
+        if len(self.outcomes) < MIN_SAMPLES_FOR_HEALTH:
+            return True
+        return self.error_rate() <= UNHEALTHY_ERROR_RATE
+
+
+_provider_stats = {}
+_stats_lock = threading.Lock()
+
+
+def _get_stats(llm_choice):
+    key = llm_choice.lower()
+    with _stats_lock:
+        if key not in _provider_stats:
+            _provider_stats[key] = ProviderStats()
+        return _provider_stats[key]
+
+
+def get_provider_stats() -> dict:
+    """Returns a snapshot of the rolling provider statistics."""
+    with _stats_lock:
+        return {
+            name: {
+                "median_first_token_seconds": stats.median_latency(),
+                "error_rate": stats.error_rate(),
+                "samples": len(stats.outcomes),
+                "healthy": stats.is_healthy(),
+            }
+            for name, stats in _provider_stats.items()
+        }
+
+
+def rank_providers(llm_choices: list[str]) -> list[str]:
+    """
+    Orders the acceptable models so healthy providers come first, fastest first.
+    Providers without latency samples come before the measured ones, in their requested
+    order, so the user's primary choice is tried (and measured) rather than only ever
+    being started as a hedge behind faster fallbacks.
+    """
+    unique_choices = []
+    for choice in llm_choices:
+        if resolve_provider(choice) is None:
+            print(f"Skipping unrecognized LLM choice: {choice}")
+        elif choice.lower() not in [c.lower() for c in unique_choices]:
+            unique_choices.append(choice)
+
+    def sort_key(choice):
+        stats = _get_stats(choice)
+        latency = stats.median_latency()
+        return (not stats.is_healthy(), latency if latency is not None else 0.0)
+
+    return sorted(unique_choices, key=sort_key)
+
+
+class _Attempt:
+    """One provider call running in a background thread, reporting to the router's queue."""
+
+    def __init__(self, llm_choice, prompt_text, events):
+        self.llm_choice = llm_choice
+        self.prompt_text = prompt_text
+        self.events = events
+        self.chunks = []
+        self.error = None
+        self.cancelled = threading.Event()
+        self.done = threading.Event()
+        self.open_streams = []
+        self.lock = threading.Lock()
+        self.started_at = time.monotonic()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def cancel(self):
+        """
+        Stops the attempt: closes the provider stream so a read blocked waiting for tokens
+        fails now (releasing the thread and governor slot), and records the time waited so
+        a provider that keeps losing hedges is ranked lower.
+        """
+        with self.lock:
+            if self.cancelled.is_set():
+                return
+            self.cancelled.set()
+            open_streams = list(self.open_streams)
+        if not self.chunks and not self.done.is_set():
+            _get_stats(self.llm_choice).record_abandoned(time.monotonic() - self.started_at)
+        for response in open_streams:
+            close_provider_stream(response)
+
+    def _on_stream_open(self, response):
+        with self.lock:
+            if not self.cancelled.is_set():
+                self.open_streams.append(response)
+                return
+        close_provider_stream(response)
+
+    def _run(self):
+        stats = _get_stats(self.llm_choice)
+        provider = resolve_provider(self.llm_choice)
+        token_count = count_tokens(self.prompt_text, model=LLM_MODELS[provider])
+        stream = governed_stream(
+            provider, token_count,
+            lambda: stream_llm_response(self.prompt_text, self.llm_choice, on_open=self._on_stream_open),
+            cancelled=self.cancelled
+        )
+        try:
+            for chunk in stream:
+                if self.cancelled.is_set():
+                    break
+                if not self.chunks:
+                    stats.record_success(time.monotonic() - self.started_at)
+                    self.chunks.append(chunk)
+                    self.events.put(("first_token", self))
+                else:
+                    self.chunks.append(chunk)
+        except Exception as e:
+            self.error = e
+            # A rejected request (e.g. a prompt too long for this model) says nothing about health
+            if not self.cancelled.is_set() and not isinstance(e, ProviderRequestError):
+                stats.record_error()
+        finally:
+            stream.close()
+            self.done.set()
+            self.events.put(("done", self))
+
+
+def route_llm_response(prompt_text: str, llm_choices: list[str],
+                       hedge_after_seconds: float | None = None) -> tuple[str, str]:
+    """
+    Sends the prompt to the best-ranked acceptable model. If it has not produced a first
+    token within hedge_after_seconds (or it fails), the next model is started as a hedge.
+    The first model to produce a token wins; the others are cancelled.
+    Uncancellable providers only run alone: they are not hedged, and are not started as hedges.
+    Returns the answer and the LLM choice that produced it.
+    """
+    if hedge_after_seconds is None:
+        hedge_after_seconds = HEDGE_AFTER_SECONDS
+    hedge_after_seconds = max(hedge_after_seconds, MIN_HEDGE_AFTER_SECONDS)
+
+    pending = rank_providers(llm_choices)
+    if not pending:
+        raise ValueError(f"No recognized LLM choice in {llm_choices}")
+    print(f"Routing LLM request across: {pending}")
+    events = queue.Queue()
+    active = []
+    errors = []
+    failures = []
+    request_deadline = time.monotonic() + LLM_REQUEST_TIMEOUT_SECONDS
+
+    def cancellable(choice):
+        return resolve_provider(choice) not in UNCANCELLABLE_PROVIDERS
+
+    def next_choice():
+        """The next provider to start, or None if none may run alongside the active ones."""
+        if not active:
+            return pending[0] if pending else None
+        if not all(cancellable(attempt.llm_choice) for attempt in active):
+            return None
+        return next((choice for choice in pending if cancellable(choice)), None)
+
+    def launch(choice):
+        pending.remove(choice)
+        active.append(_Attempt(choice, prompt_text, events))
+        return time.monotonic() + hedge_after_seconds
+
+    hedge_deadline = launch(next_choice())
+    winner = None
+
+    while winner is None:
+        now = time.monotonic()
+        if now >= request_deadline:
+            break
+        wait_until = min(hedge_deadline, request_deadline) if next_choice() else request_deadline
+        try:
+            kind, attempt = events.get(timeout=max(wait_until - now, 0))
+        except queue.Empty:
+            choice = next_choice()
+            if choice and time.monotonic() >= hedge_deadline:
+                print(f"No first token within {hedge_after_seconds}s, hedging to {choice}")
+                hedge_deadline = launch(choice)
+            continue
+
+        if attempt not in active:
+            continue
+        if kind == "first_token":
+            winner = attempt
+        elif attempt.error is not None:
+            print(f"LLM provider '{attempt.llm_choice}' failed: {attempt.error}")
+            errors.append(f"{attempt.llm_choice}: {attempt.error}")
+            failures.append(attempt.error)
+            active.remove(attempt)
+            choice = next_choice()
+            if choice:
+                hedge_deadline = launch(choice)
+            elif not active:
+                break
+        else:
+            # Finished without producing any text; accept the empty answer
+            winner = attempt
+
+    for attempt in active:
+        if attempt is not winner:
+            attempt.cancel()
+
+    if winner is None:
+        if errors and all(isinstance(failure, ProviderRequestError) for failure in failures):
+            # Every provider rejected the request itself: report that (4xx), not an outage
+            raise failures[0]
+        if errors:
+            raise ProviderUnavailableError("All LLM providers failed: " + "; ".join(errors))
+        raise ProviderTimeoutError(f"No LLM provider answered within {LLM_REQUEST_TIMEOUT_SECONDS}s")
+
+    if not winner.done.wait(timeout=max(request_deadline - time.monotonic(), 0)):
+        winner.cancel()
+        raise ProviderTimeoutError(f"LLM provider '{winner.llm_choice}' did not finish in time")
+    if winner.error is not None:
+        raise winner.error
+
+    print(f"LLM request answered by '{winner.llm_choice}'")
+    return "".join(winner.chunks), winner.llm_choice
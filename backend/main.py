@@ -2,15 +2,21 @@
 
 import os
 import json
+import zlib
+import hashlib
+import mmap
+import time
 import boto3
 import uvicorn
 from fastapi import FastAPI, HTTPException, UploadFile, File
 from fastapi.responses import JSONResponse
+from fastapi.middleware.gzip import GZipMiddleware
 from pydantic import BaseModel
 from dotenv import load_dotenv
 import tempfile
 from pdf_extractor import extract_pdf_content
 from llm_chat import get_llm_response
+from llm_governor import LLMProviderError, get_governor_stats
 
 # Load environment variables
 load_dotenv()
@@ -21,9 +27,75 @@ AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
 AWS_DEFAULT_REGION = os.getenv("AWS_DEFAULT_REGION", "us-east-2")
 S3_BUCKET_NAME = os.getenv("S3_BUCKET_NAME")
 S3_MARKDOWN_FOLDER = "Markdowns/"
+S3_INDEX_FOLDER = "Indexes/"
+
+# Optional local cache of Markdown files, served with mmap instead of ranged S3 GETs
+MARKDOWN_CACHE_DIR = os.getenv("MARKDOWN_CACHE_DIR")
+# Seconds a fetched page/section index is reused before re-reading it from S3
+MARKDOWN_INDEX_TTL = 60
+# Largest request body accepted after gzip decompression
+MAX_DECOMPRESSED_BODY_BYTES = int(os.getenv("MAX_DECOMPRESSED_BODY_BYTES", str(50 * 1024 * 1024)))
+
+class GzipRequestMiddleware:
+    """
+    Decompresses request bodies sent with Content-Encoding: gzip (large JSON from the frontend).
+    Decompression is incremental and stops at MAX_DECOMPRESSED_BODY_BYTES, so a small
+    compressed body cannot expand into gigabytes; oversized bodies get a 413, corrupt ones a 400.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or (b"content-encoding", b"gzip") not in scope["headers"]:
+            await self.app(scope, receive, send)
+            return
+
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        body = bytearray()
+        more_body = True
+        try:
+            while more_body:
+                message = await receive()
+                more_body = message.get("more_body", False)
+                # Ask for one byte more than allowed so an oversized body is detected
+                body += decompressor.decompress(
+                    message.get("body", b""), MAX_DECOMPRESSED_BODY_BYTES - len(body) + 1
+                )
+                if len(body) > MAX_DECOMPRESSED_BODY_BYTES:
+                    await self._reject(scope, receive, send, 413,
+                                       f"Decompressed request body exceeds {MAX_DECOMPRESSED_BODY_BYTES} bytes")
+                    return
+            if not decompressor.eof:
+                raise zlib.error("truncated gzip stream")
+        except zlib.error as e:
+            await self._reject(scope, receive, send, 400, f"Invalid gzip request body: {e}")
+            return
+        body = bytes(body)
+
+        headers = [(k, v) for k, v in scope["headers"] if k not in (b"content-encoding", b"content-length")]
+        headers.append((b"content-length", str(len(body)).encode()))
+        body_sent = False
+
+        async def receive_decompressed():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        await self.app(dict(scope, headers=headers), receive_decompressed, send)
+
+    @staticmethod
+    async def _reject(scope, receive, send, status_code, detail):
+        print(f"Rejected gzip request body ({status_code}): {detail}")
+        response = JSONResponse(status_code=status_code, content={"detail": detail})
+        await response(scope, receive, send)
 
 # Initialize FastAPI
 app = FastAPI()
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+app.add_middleware(GzipRequestMiddleware)
 
 # Initialize S3 Client
 s3_client = boto3.client(
@@ -38,12 +110,17 @@ s3_client = boto3.client(
 ########################################
 class MarkdownRequest(BaseModel):
     markdown_filename: str
+    page: int | None = None       # 1-based first page to return
+    page_count: int = 1           # number of pages returned with `page`
+    section: int | None = None    # 0-based section index (Markdown headings)
 
 class ChatRequest(BaseModel):
     question: str
     pdf_json: str | None = None
     markdown_filename: str | None = None
     llm_choice: str
+    fallback_llms: list[str] | None = None
+    hedge_after_seconds: float | None = None
 
 ########################################
 #         S3 Utility Functions         #
@@ -58,6 +135,122 @@ def get_markdown_from_s3(markdown_filename: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching Markdown content: {e}")
 
+_index_cache = {}
+
+class StaleMarkdownIndex(Exception):
+    """The Markdown changed since its index was loaded; the byte offsets no longer apply."""
+
+def load_markdown_index(markdown_filename: str, refresh: bool = False):
+    """
+    Returns the page/section byte-offset index of the current Markdown, or None for Markdown
+    converted before indexes existed. The Markdown's metadata names the content hash its
+    index is stored under, and the index is returned with the ETag of the object it
+    describes, so reads can be made conditional on that exact object.
+    """
+    cached = _index_cache.get(markdown_filename)
+    if not refresh and cached and time.monotonic() - cached[0] < MARKDOWN_INDEX_TTL:
+        return cached[1]
+    pdf_name = os.path.splitext(markdown_filename)[0]
+    try:
+        head = s3_client.head_object(Bucket=S3_BUCKET_NAME, Key=f"{S3_MARKDOWN_FOLDER}{markdown_filename}")
+        content_hash = head.get("Metadata", {}).get("content-hash")
+        index = None
+        if content_hash:
+            response = s3_client.get_object(Bucket=S3_BUCKET_NAME, Key=f"{S3_INDEX_FOLDER}{pdf_name}/{content_hash}.json")
+            index = json.loads(response["Body"].read().decode("utf-8"))
+            index["etag"] = head["ETag"]
+    except s3_client.exceptions.ClientError as e:
+        # Missing Markdown (head_object answers a bare 404) or missing index
+        if e.response["Error"]["Code"] not in ("404", "NoSuchKey"):
+            raise
+        index = None
+    _index_cache[markdown_filename] = (time.monotonic(), index)
+    return index
+
+def _is_precondition_failed(e: Exception) -> bool:
+    return isinstance(e, s3_client.exceptions.ClientError) and \
+        e.response["Error"]["Code"] in ("PreconditionFailed", "412")
+
+def _cached_markdown_path(markdown_filename: str, index: dict) -> str:
+    """
+    Local copy of exactly the object the index describes, named by its ETag. The download is
+    conditional on that ETag (a plain get_object: download_file does not accept IfMatch)
+    and checked against the index's size and content hash.
+    """
+    etag = index["etag"].strip('"')
+    local_path = os.path.join(MARKDOWN_CACHE_DIR, f"{etag}_{markdown_filename}")
+    if os.path.exists(local_path):
+        return local_path
+    os.makedirs(MARKDOWN_CACHE_DIR, exist_ok=True)
+    part_path = f"{local_path}.{os.getpid()}.part"
+    try:
+        response = s3_client.get_object(Bucket=S3_BUCKET_NAME, Key=f"{S3_MARKDOWN_FOLDER}{markdown_filename}",
+                                        IfMatch=index["etag"])
+        digest = hashlib.sha256()
+        with open(part_path, "wb") as f:
+            for block in response["Body"].iter_chunks(1024 * 1024):
+                digest.update(block)
+                f.write(block)
+        if os.path.getsize(part_path) != index["total_bytes"] or digest.hexdigest() != index["content_hash"]:
+            raise StaleMarkdownIndex(f"{markdown_filename} does not match its index")
+        os.replace(part_path, local_path)
+    except Exception as e:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        if _is_precondition_failed(e):
+            raise StaleMarkdownIndex(f"{markdown_filename} changed since its index was loaded")
+        raise
+    return local_path
+
+def read_markdown_range(markdown_filename: str, index: dict, start: int, end: int) -> str:
+    """
+    Reads bytes [start, end) of the Markdown object the index describes: from a memory-mapped
+    local copy when MARKDOWN_CACHE_DIR is set, otherwise with a ranged S3 GET conditional on
+    the index's ETag. Raises StaleMarkdownIndex if the Markdown has been replaced since.
+    """
+    if end <= start:
+        return ""
+    if MARKDOWN_CACHE_DIR:
+        local_path = _cached_markdown_path(markdown_filename, index)
+        with open(local_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return mm[start:end].decode("utf-8")
+
+    try:
+        response = s3_client.get_object(Bucket=S3_BUCKET_NAME, Key=f"{S3_MARKDOWN_FOLDER}{markdown_filename}",
+                                         Range=f"bytes={start}-{end - 1}", IfMatch=index["etag"])
+    except s3_client.exceptions.ClientError as e:
+        if _is_precondition_failed(e):
+            raise StaleMarkdownIndex(f"{markdown_filename} changed since its index was loaded")
+        raise
+    return response["Body"].read().decode("utf-8")
+
+def read_indexed_markdown(markdown_filename: str, select_range):
+    """
+    Loads the index and reads the byte range select_range(index) returns. If the Markdown
+    was replaced after the index was loaded, the index is re-read and the read retried once.
+    Returns (index, content), or (None, None) for Markdown without an index.
+    """
+    for refresh in (False, True):
+        index = load_markdown_index(markdown_filename, refresh=refresh)
+        if index is None:
+            return None, None
+        start, end = select_range(index)
+        try:
+            return index, read_markdown_range(markdown_filename, index, start, end)
+        except StaleMarkdownIndex as e:
+            print(f"Stale Markdown index: {e}")
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error fetching Markdown content: {e}")
+    raise HTTPException(status_code=503, detail=f"{markdown_filename} is being updated; try again shortly.",
+                        headers={"Retry-After": "1"})
+
+def provider_error_to_http(e: LLMProviderError) -> HTTPException:
+    """Maps an LLM provider failure to the HTTP status (429/502/503/504) returned to the client."""
+    headers = None
+    if e.retry_after is not None:
+        headers = {"Retry-After": str(max(1, int(round(e.retry_after))))}
+    return HTTPException(status_code=e.status_code, detail=str(e), headers=headers)
+
 ########################################
 #            API Endpoints             #
 ########################################
@@ -73,9 +266,39 @@ def fetch_markdown_files():
 
 @app.post("/get_markdown_content/")
 def get_markdown_content(request: MarkdownRequest):
-    """Fetches the content of a selected Markdown file from S3."""
-    markdown_content = get_markdown_from_s3(request.markdown_filename)
-    return {"markdown_content": markdown_content}
+    """
+    Fetches the content of a selected Markdown file from S3.
+    With `page` (and optionally `page_count`) or `section`, only that slice is read, using
+    the byte offsets in the document's index. Without them the whole file is returned.
+    """
+    if request.page is None and request.section is None:
+        markdown_content = get_markdown_from_s3(request.markdown_filename)
+        return {"markdown_content": markdown_content}
+
+    def select_range(index):
+        if request.section is not None:
+            if not 0 <= request.section < len(index["sections"]):
+                raise HTTPException(status_code=400, detail=f"Section {request.section} does not exist.")
+            section = index["sections"][request.section]
+            return section["start"], section["end"]
+        pages = index["pages"][request.page - 1:request.page - 1 + max(request.page_count, 1)]
+        if request.page < 1 or not pages:
+            raise HTTPException(status_code=400, detail=f"Page {request.page} does not exist.")
+        # The first page also carries the document header
+        return (0 if request.page == 1 else pages[0]["start"]), pages[-1]["end"]
+
+    index, markdown_content = read_indexed_markdown(request.markdown_filename, select_range)
+    if index is None:
+        # Converted before indexes existed: serve the whole file as a single page
+        markdown_content = get_markdown_from_s3(request.markdown_filename)
+        return {"markdown_content": markdown_content, "page": 1, "total_pages": 1, "sections": []}
+
+    section_titles = [section["title"] for section in index["sections"]]
+    if request.section is not None:
+        return {"markdown_content": markdown_content, "section": request.section,
+                "total_pages": len(index["pages"]), "sections": section_titles}
+    return {"markdown_content": markdown_content, "page": request.page,
+            "total_pages": len(index["pages"]), "sections": section_titles}
 
 """
 @app.post("/upload_pdf/")
@@ -119,28 +342,26 @@ async def upload_pdf(file: UploadFile = File(...)):
 
 
 @app.post("/convert_pdf_markdown/")
-async def convert_pdf_markdown(file: UploadFile = File(...)):
+async def convert_pdf_markdown(file: UploadFile = File(...), update: bool = False):
     """
     Uploads a PDF, checks if a Markdown with the same name already exists in S3,
     if not, converts it to Markdown using pdf_markdown_convertor.py logic,
     uploads the Markdown file to S3, and returns the Markdown file URL.
+    With update=true, a revised PDF is re-converted incrementally as a new version:
+    only changed pages are re-extracted.
     """
+    from pdf_markdown_convertor import markdown_exists, pdf_to_markdown_s3, pdf_to_markdown_s3_incremental
+
     original_pdf_name = file.filename  # e.g. "MyDocument.pdf"
     markdown_filename = os.path.splitext(original_pdf_name)[0] + ".md"
-    object_key = f"{S3_MARKDOWN_FOLDER}{markdown_filename}"
 
-    # 1) Check for a duplicate markdown in S3
-    try:
-        s3_client.head_object(Bucket=S3_BUCKET_NAME, Key=object_key)
-        # If no exception, the file already exists
+    # 1) Check for a duplicate markdown in S3 (same check as bulk_convert.py)
+    if not update and markdown_exists(markdown_filename):
         raise HTTPException(
             status_code=400,
-            detail=f"Markdown '{markdown_filename}' already exists in S3. Duplicate not allowed."
+            detail=f"Markdown '{markdown_filename}' already exists in S3. Duplicate not allowed. "
+                   f"Use update=true to upload a revised version."
         )
-    except s3_client.exceptions.ClientError as e:
-        # If it's a 404, that means the object doesn't exist => proceed
-        if e.response["Error"]["Code"] != "404":
-            raise
 
     # 2) Convert to Markdown (no duplicate found)
     try:
@@ -150,10 +371,16 @@ async def convert_pdf_markdown(file: UploadFile = File(...)):
             tmp_path = tmp.name
 
         # Pass original_pdf_name so the converter uses the PDF's base name for .md
-        from pdf_markdown_convertor import pdf_to_markdown_s3
+        if update:
+            result = pdf_to_markdown_s3_incremental(pdf_path=tmp_path, original_filename=original_pdf_name)
+            os.remove(tmp_path)
+            _index_cache.pop(markdown_filename, None)
+            return JSONResponse(content=result)
+
         markdown_url = pdf_to_markdown_s3(pdf_path=tmp_path, original_filename=original_pdf_name)
         
         os.remove(tmp_path)
+        _index_cache.pop(markdown_filename, None)
         return JSONResponse(content={"markdown_url": markdown_url})
 
     except Exception as e:
@@ -169,17 +396,34 @@ def chat(request: ChatRequest):
     try:
         if request.pdf_json:
             pdf_data = json.loads(request.pdf_json)
-            answer = get_llm_response(pdf_data, request.question, request.llm_choice)
+            answer = get_llm_response(pdf_data, request.question, request.llm_choice,
+                                      request.fallback_llms, request.hedge_after_seconds)
         elif request.markdown_filename:
             markdown_content = get_markdown_from_s3(request.markdown_filename)
             markdown_data = {"pdf_content": markdown_content, "tables": []}
-            answer = get_llm_response(markdown_data, request.question, request.llm_choice)
+            answer = get_llm_response(markdown_data, request.question, request.llm_choice,
+                                      request.fallback_llms, request.hedge_after_seconds,
+                                      document_id=request.markdown_filename)
         else:
             return {"error": "No valid input provided."}
         return {"answer": answer}
+    except LLMProviderError as e:
+        raise provider_error_to_http(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing chat request: {e}")
 
+@app.get("/llm_provider_stats/")
+def llm_provider_stats():
+    """Returns rolling latency and error rates used to rank LLM providers, and governor state."""
+    from llm_router import get_provider_stats
+    return {"providers": get_provider_stats(), "governors": get_governor_stats()}
+
+@app.get("/semantic_cache_stats/")
+def semantic_cache_stats():
+    """Returns hit rate and provider latency saved by the semantic answer cache."""
+    from semantic_cache import answer_cache
+    return answer_cache.stats()
+
 # Add these helper functions in backend/main.py (or a separate module if preferred)
 
 @app.post("/summarize/")
@@ -192,14 +436,19 @@ def summarize(request: ChatRequest):
     try:
         if request.pdf_json:
             pdf_data = json.loads(request.pdf_json)
-            answer = get_llm_response(pdf_data, summary_question, request.llm_choice)
+            answer = get_llm_response(pdf_data, summary_question, request.llm_choice,
+                                      request.fallback_llms, request.hedge_after_seconds)
         elif request.markdown_filename:
             markdown_content = get_markdown_from_s3(request.markdown_filename)
             markdown_data = {"pdf_content": markdown_content, "tables": []}
-            answer = get_llm_response(markdown_data, summary_question, request.llm_choice)
+            answer = get_llm_response(markdown_data, summary_question, request.llm_choice,
+                                      request.fallback_llms, request.hedge_after_seconds,
+                                      document_id=request.markdown_filename)
         else:
             return {"error": "No valid input provided."}
         return {"answer": answer}
+    except LLMProviderError as e:
+        raise provider_error_to_http(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing summarize request: {e}")
 
@@ -4,6 +4,7 @@ import PyPDF2
 import camelot
 import json
 import re
+from table_detection import find_table_pages
 
 def clean_text(text):
     """Removes excessive spaces, newlines, and unwanted symbols from extracted text."""
@@ -25,12 +26,22 @@ def extract_pdf_content(pdf_path: str) -> dict:
     # Clean extracted text
     text_content = clean_text(text_content)
 
+    # Find pages likely to contain tables so Camelot skips text-only pages
+    try:
+        candidate_pages, total_pages = find_table_pages(pdf_path)
+        pages = ",".join(str(page_num) for page_num in candidate_pages)
+        print(f"Table pre-pass: skipped {total_pages - len(candidate_pages)} of {total_pages} pages")
+    except Exception as e:
+        print(f"Error in table pre-pass, scanning all pages: {e}")
+        pages = "all"
+
     # Extract tables using Camelot
     tables_data = []
     try:
-        tables = camelot.read_pdf(pdf_path, pages='all', flavor='stream')
-        for table in tables:
-            tables_data.append(table.df.to_dict(orient="records"))
+        if pages:
+            tables = camelot.read_pdf(pdf_path, pages=pages, flavor='stream')
+            for table in tables:
+                tables_data.append(table.df.to_dict(orient="records"))
     except Exception as e:
         print(f"Error extracting tables: {e}")
 
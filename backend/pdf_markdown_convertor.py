@@ -4,6 +4,9 @@ import fitz  # PyMuPDF for image extraction
 import pdfplumber  # For text and table extraction
 import os
 import re
+import json
+import time
+import hashlib
 import pandas as pd
 import boto3
 import tempfile
@@ -17,6 +20,13 @@ S3_MARKDOWN_FOLDER = "Markdowns/"
 # S3 Folders
 S3_MARKDOWN_FOLDER = "Markdowns/"
 S3_IMAGES_FOLDER = "Images/"
+# Per-document version history and page manifests for incremental re-conversion
+S3_CONVERSIONS_FOLDER = "Conversions/"
+# Sidecar page/section byte-offset indexes for ranged reads of the Markdown
+S3_INDEX_FOLDER = "Indexes/"
+
+# Longest first line of a page that is still turned into a section heading
+MAX_TITLE_LENGTH = 100
 
 # Manually specify the input PDF path
 PDF_PATH = "C:/Users/Administrator/Downloads/VAEs - Week 8.pdf"  #  Change this to your PDF file path
@@ -41,68 +51,231 @@ def upload_file_to_s3(file_path, s3_key):
         return None
 
 
+def markdown_exists(markdown_filename):
+    """Returns True if a Markdown file with this name is already stored in S3."""
+    try:
+        s3_client.head_object(Bucket=S3_BUCKET_NAME, Key=f"{S3_MARKDOWN_FOLDER}{markdown_filename}")
+        return True
+    except s3_client.exceptions.ClientError as e:
+        # A 404 means the object doesn't exist; anything else is a real error
+        if e.response["Error"]["Code"] != "404":
+            raise
+        return False
+
+
 def clean_text(text):
     """Removes excessive spaces and unwanted symbols from extracted text."""
     text = re.sub(r"\s+", " ", text)  # Replace multiple spaces/newlines with a single space
     return text.strip()
 
 
-def extract_pdf_content(pdf_path, s3_image_folder):
-    """Extracts text, tables, and images while maintaining document structure."""
-    doc = fitz.open(pdf_path)
+def page_text_markdown(page_text):
+    """
+    Turns a page's text into a '## title' heading (its first line, usually the slide or
+    section title) followed by the rest of the text on one line. The headings are what the
+    section index is built from; pages whose first line is too long to be a title get none.
+    """
+    title, _, body = page_text.strip().partition("\n")
+    title = clean_text(title).lstrip("#").strip()
+    if not title or len(title) > MAX_TITLE_LENGTH:
+        title, body = "", page_text
+    body = clean_text(body)
+    # Text starting with '#' would otherwise be read as a heading
+    if body.startswith("#"):
+        body = "\\" + body
+    md_content = f"## {title}\n\n" if title else ""
+    if body:
+        md_content += f"{body}\n\n"
+    return md_content
+
+
+def extract_page_markdown(doc, pdf_page, page_num, s3_image_folder, image_prefix=None):
+    """
+    Extracts text, tables, and images of a single page as a Markdown fragment.
+    Images are named image_{image_prefix}_{n}; image_prefix defaults to the page number.
+    No table pre-pass here: extract_text has already parsed the page layout, so pdfplumber's
+    extract_tables costs almost nothing on top of it (the pre-pass pays off for Camelot).
+    """
+    page = doc[page_num]
+    if image_prefix is None:
+        image_prefix = page_num + 1
     md_content = ""
 
+    # Extract text first
+    if pdf_page:
+        page_text = pdf_page.extract_text()
+        if page_text:
+            md_content += page_text_markdown(page_text)
+
+    # Extract tables
+    if pdf_page:
+        tables = pdf_page.extract_tables()
+        for table in tables:
+            if table:
+                df = pd.DataFrame(table)
+                md_content += f"{df.to_markdown(index=False)}\n\n"
+
+    # Extract images
+    images = page.get_images(full=True)
+    for img_index, img in enumerate(images):
+        xref = img[0]
+        base_image = doc.extract_image(xref)
+        if not base_image:
+            continue
+
+        image_bytes = base_image["image"]
+        image_ext = base_image["ext"]
+        img_filename = f"image_{image_prefix}_{img_index+1}.{image_ext}"
+
+        # Save image temporarily
+        with tempfile.NamedTemporaryFile(delete=False, suffix=f".{image_ext}") as tmp_img:
+            tmp_img.write(image_bytes)
+            tmp_path = tmp_img.name
+
+        # Upload to S3
+        s3_url = upload_file_to_s3(tmp_path, f"{s3_image_folder}/{img_filename}")
+        os.remove(tmp_path)
+
+        if s3_url:
+            md_content += f"![Image]({s3_url})\n\n"
+
+    return md_content
+
+
+def page_content_hash(doc, page_num):
+    """
+    Hashes everything that affects a page's extracted Markdown: its content stream, the text
+    as extracted (which changes with font encodings and Form XObjects even when the page's
+    own content stream does not), the fonts used, the Form XObject streams and the raw image
+    data. Plain text extraction keeps this cheap next to the pdfplumber extraction it saves.
+    """
+    page = doc[page_num]
+    digest = hashlib.sha256(page.read_contents())
+    digest.update(page.get_text("text").encode("utf-8"))
+    digest.update(repr(sorted(font[3:6] for font in page.get_fonts(full=True))).encode("utf-8"))
+    for xobject in page.get_xobjects():
+        digest.update(doc.xref_stream_raw(xobject[0]) or b"")
+    for img in page.get_images(full=True):
+        digest.update(doc.xref_stream_raw(img[0]) or b"")
+    return digest.hexdigest()
+
+
+def extract_pdf_pages(pdf_path, s3_image_folder, previous_fragments=None):
+    """
+    Extracts text, tables, and images page by page. Returns one {"hash", "markdown"} entry per
+    page and the number of pages re-extracted; pages whose hash is in previous_fragments reuse
+    that Markdown. Images are named by page hash, so a reused fragment never points at an
+    image that a later version overwrote.
+    """
+    previous_fragments = previous_fragments or {}
+    doc = fitz.open(pdf_path)
+    pages = []
+    reextracted = 0
+
     with pdfplumber.open(pdf_path) as pdf:
         for page_num in range(len(doc)):
-            page = doc[page_num]
-            pdf_page = pdf.pages[page_num] if page_num < len(pdf.pages) else None
-
-            # Extract text first
-            if pdf_page:
-                page_text = pdf_page.extract_text()
-                if page_text:
-                    md_content += f"{clean_text(page_text)}\n\n"
-
-            # Extract tables
-            if pdf_page:
-                tables = pdf_page.extract_tables()
-                for table in tables:
-                    if table:
-                        df = pd.DataFrame(table)
-                        md_content += f"{df.to_markdown(index=False)}\n\n"
-
-            # Extract images
-            images = page.get_images(full=True)
-            for img_index, img in enumerate(images):
-                xref = img[0]
-                base_image = doc.extract_image(xref)
-                if not base_image:
-                    continue
-
-                image_bytes = base_image["image"]
-                image_ext = base_image["ext"]
-                img_filename = f"image_{page_num+1}_{img_index+1}.{image_ext}"
-
-                # Save image temporarily
-                with tempfile.NamedTemporaryFile(delete=False, suffix=f".{image_ext}") as tmp_img:
-                    tmp_img.write(image_bytes)
-                    tmp_path = tmp_img.name
-
-                # Upload to S3
-                s3_url = upload_file_to_s3(tmp_path, f"{s3_image_folder}/{img_filename}")
-                os.remove(tmp_path)
-
-                if s3_url:
-                    md_content += f"![Image]({s3_url})\n\n"
+            page_hash = page_content_hash(doc, page_num)
+            fragment = previous_fragments.get(page_hash)
+            if fragment is None:
+                pdf_page = pdf.pages[page_num] if page_num < len(pdf.pages) else None
+                fragment = extract_page_markdown(doc, pdf_page, page_num, s3_image_folder,
+                                                 image_prefix=page_hash[:16])
+                reextracted += 1
+            pages.append({"hash": page_hash, "markdown": fragment})
 
     doc.close()
-    return md_content
+    return pages, reextracted
+
+
+def extract_pdf_content(pdf_path, s3_image_folder):
+    """Extracts text, tables, and images while maintaining document structure."""
+    pages, _ = extract_pdf_pages(pdf_path, s3_image_folder)
+    return "".join(page["markdown"] for page in pages)
+
+
+def build_markdown_with_index(header, page_fragments):
+    """
+    Joins the header and page fragments into the final Markdown and builds its sidecar index:
+    UTF-8 byte offsets [start, end) of every page and of every Markdown heading's section.
+    """
+    md_content = header + "".join(page_fragments)
+    encoded = md_content.encode("utf-8")
+
+    pages = []
+    offset = len(header.encode("utf-8"))
+    for page_num, fragment in enumerate(page_fragments, start=1):
+        size = len(fragment.encode("utf-8"))
+        pages.append({"page": page_num, "start": offset, "end": offset + size})
+        offset += size
+
+    sections = []
+    line_start = 0
+    for line in encoded.split(b"\n"):
+        if line.startswith(b"#"):
+            if sections:
+                sections[-1]["end"] = line_start
+            sections.append({"title": line.lstrip(b"#").strip().decode("utf-8", "replace"),
+                             "start": line_start, "end": len(encoded)})
+        line_start += len(line) + 1
+
+    index = {
+        "total_bytes": len(encoded),
+        "content_hash": hashlib.sha256(encoded).hexdigest(),
+        "pages": pages,
+        "sections": sections,
+    }
+    return md_content, index
+
+
+def markdown_index_key(pdf_name, content_hash):
+    """Indexes are stored per content hash, so an index never changes once written."""
+    return f"{S3_INDEX_FOLDER}{pdf_name}/{content_hash}.json"
+
+
+def load_conversion_manifest(pdf_name):
+    """Returns the page manifest of the previous conversion, or None if there is none."""
+    key = f"{S3_CONVERSIONS_FOLDER}{pdf_name}/manifest.json"
+    try:
+        response = s3_client.get_object(Bucket=S3_BUCKET_NAME, Key=key)
+        return json.loads(response["Body"].read().decode("utf-8"))
+    except s3_client.exceptions.NoSuchKey:
+        return None
+
+
+def publish_markdown_version(pdf_name, pages, version):
+    """
+    Builds the Markdown and its index from the page fragments and makes them current.
+
+    Order matters because S3 has no multi-object transactions: 1) the index is written under
+    its content hash, 2) the Markdown is written as a new version tagged with that hash,
+    3) a single copy replaces the current Markdown (the only write readers observe; its
+    metadata names the index to use), 4) the manifest used by the next incremental
+    conversion is written last. A failure at any step leaves the previous Markdown and
+    its index consistent.
+    """
+    s3_markdown_key = f"{S3_MARKDOWN_FOLDER}{pdf_name}.md"
+    header = f"# Extracted Content from {pdf_name}\n\n"
+    md_content, index = build_markdown_with_index(header, [page["markdown"] for page in pages])
+
+    s3_client.put_object(Bucket=S3_BUCKET_NAME, Key=markdown_index_key(pdf_name, index["content_hash"]),
+                         Body=json.dumps(index).encode("utf-8"), ContentType="application/json")
+    version_key = f"{S3_CONVERSIONS_FOLDER}{pdf_name}/v{version}.md"
+    s3_client.put_object(Bucket=S3_BUCKET_NAME, Key=version_key, Body=md_content.encode("utf-8"),
+                         ContentType="text/markdown", Metadata={"content-hash": index["content_hash"]})
+    s3_client.copy_object(Bucket=S3_BUCKET_NAME, Key=s3_markdown_key,
+                          CopySource={"Bucket": S3_BUCKET_NAME, "Key": version_key})
+    manifest = {"version": version, "pages": pages}
+    s3_client.put_object(Bucket=S3_BUCKET_NAME, Key=f"{S3_CONVERSIONS_FOLDER}{pdf_name}/manifest.json",
+                         Body=json.dumps(manifest).encode("utf-8"), ContentType="application/json")
+
+    return f"https://{S3_BUCKET_NAME}.s3.{AWS_DEFAULT_REGION}.amazonaws.com/{s3_markdown_key}"
 
 
 def pdf_to_markdown_s3(pdf_path, original_filename=None):
     """
     Extracts PDF content, uploads images, and saves Markdown to S3.
     If original_filename is provided, use that name for the .md file.
+    Also records the page manifest, so a later revised upload only re-extracts changed pages.
     """
     # Derive the base name from either original_filename or pdf_path
     if original_filename:
@@ -110,26 +283,51 @@ def pdf_to_markdown_s3(pdf_path, original_filename=None):
     else:
         pdf_name = os.path.splitext(os.path.basename(pdf_path))[0]
 
-    markdown_filename = f"{pdf_name}.md"
-
     s3_image_folder = f"{S3_IMAGES_FOLDER}{pdf_name}"
-    s3_markdown_key = f"{S3_MARKDOWN_FOLDER}{markdown_filename}"
-
-    md_content = f"# Extracted Content from {pdf_name}\n\n"
-    md_content += extract_pdf_content(pdf_path, s3_image_folder)
+    previous = load_conversion_manifest(pdf_name)
+    version = previous["version"] + 1 if previous else 1
 
-    # Save Markdown to a temporary file
-    markdown_temp_path = os.path.join(tempfile.gettempdir(), markdown_filename)
-    with open(markdown_temp_path, "w", encoding="utf-8") as md_file:
-        md_file.write(md_content)
-
-    # Upload to S3
-    md_s3_url = upload_file_to_s3(markdown_temp_path, s3_markdown_key)
-    os.remove(markdown_temp_path)
+    pages, _ = extract_pdf_pages(pdf_path, s3_image_folder)
+    try:
+        md_s3_url = publish_markdown_version(pdf_name, pages, version)
+    except Exception as e:
+        print(f" Failed to upload Markdown for {pdf_name} to S3: {e}")
+        return None
     print(f"Markdown uploaded to: {md_s3_url}")
     return md_s3_url
 
 
+def pdf_to_markdown_s3_incremental(pdf_path, original_filename=None):
+    """
+    Versioned conversion of a (revised) PDF. Pages whose content hash matches the previous
+    version reuse its Markdown fragment and already-uploaded images; only changed pages are
+    re-extracted. The result is published as a new version (see publish_markdown_version).
+    """
+    started = time.monotonic()
+    if original_filename:
+        pdf_name = os.path.splitext(os.path.basename(original_filename))[0]
+    else:
+        pdf_name = os.path.splitext(os.path.basename(pdf_path))[0]
+
+    s3_image_folder = f"{S3_IMAGES_FOLDER}{pdf_name}"
+    previous = load_conversion_manifest(pdf_name)
+    previous_fragments = {page["hash"]: page["markdown"] for page in previous["pages"]} if previous else {}
+    version = previous["version"] + 1 if previous else 1
+
+    pages, reextracted = extract_pdf_pages(pdf_path, s3_image_folder, previous_fragments)
+    md_s3_url = publish_markdown_version(pdf_name, pages, version)
+
+    elapsed = time.monotonic() - started
+    print(f"Markdown v{version} uploaded to: {md_s3_url} "
+          f"({reextracted}/{len(pages)} pages re-extracted in {elapsed:.1f}s)")
+    return {
+        "markdown_url": md_s3_url,
+        "version": version,
+        "pages_total": len(pages),
+        "pages_reextracted": reextracted,
+        "seconds": round(elapsed, 2),
+    }
+
 
 # Run the script
 if __name__ == "__main__":
@@ -0,0 +1,225 @@
+# backend/semantic_cache.py
+"""
+Per-document cache of LLM answers that also matches lightly reworded questions.
+
+Questions are normalized (lowercased, stop words dropped, a few course-specific synonyms
+mapped to one word, light suffix stripping) and turned into local TF-IDF vectors of words
+and character trigrams. A stored answer is reused when its question's cosine similarity to
+the new one reaches SEMANTIC_CACHE_THRESHOLD and both questions have the same question
+word, negation, numbers and single-letter labels ("part A" vs "part B"). This catches rewordings (word order, inflections, "due" vs
+"deadline") but not paraphrases that share no words, and questions asked with different
+question words ("What is the deadline?" / "When is it due?") are never treated as the same.
+Answers for a document are dropped as soon as its content fingerprint changes.
+"""
+
+import math
+import os
+import re
+import threading
+from collections import Counter
+
+# Cosine similarity needed to reuse a cached answer (1.0 = exact matches only)
+SIMILARITY_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.8"))
+# Cached questions kept per document; the oldest are evicted first
+MAX_ENTRIES_PER_DOCUMENT = 200
+# Documents kept in the cache; the least recently used is evicted first
+MAX_DOCUMENTS = 100
+
+STOP_WORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "been", "do", "does", "did", "of", "in",
+    "on", "at", "to", "for", "from", "by", "with", "about", "and", "or", "it", "this", "that",
+    "these", "those", "can", "could", "would", "should", "will", "please", "tell", "give", "me",
+    "i", "we", "you", "my", "our", "your", "there", "any", "some",
+}
+
+# Question words, mapped to one form; two questions must use the same one to share an answer
+QUESTION_WORDS = {
+    "what": "what", "whats": "what", "which": "what", "when": "when", "where": "where",
+    "who": "who", "whom": "who", "whose": "who", "why": "why", "how": "how", "hows": "how",
+}
+
+# Negations ("isn't" is tokenized as "isnt"); a negated question never matches a plain one
+NEGATIONS = {
+    "not", "no", "never", "cannot", "isnt", "arent", "wasnt", "werent", "dont", "doesnt", "didnt",
+    "cant", "couldnt", "wouldnt", "shouldnt", "wont", "hasnt", "havent", "hadnt",
+}
+
+# Nouns followed by a label ("part a", "lecture ii"); the label is kept even if it is a stop word
+LABEL_NOUNS = {
+    "part", "parts", "section", "sections", "lecture", "lectures", "question", "questions",
+    "chapter", "chapters", "week", "weeks", "assignment", "assignments", "exercise", "exercises",
+    "problem", "problems", "task", "tasks", "appendix", "figure", "table", "slide", "slides",
+    "unit", "units", "module", "modules", "lab", "labs", "option", "options", "step", "steps",
+}
+
+# Roman numeral labels, mapped to numbers so "lecture ii" and "lecture 2" match
+ROMAN_NUMERALS = {
+    "i": "1", "ii": "2", "iii": "3", "iv": "4", "v": "5", "vi": "6", "vii": "7", "viii": "8",
+    "ix": "9", "x": "10", "xi": "11", "xii": "12",
+}
+
+# Words course questions use interchangeably, mapped to one form before stemming
+SYNONYMS = {
+    "due": "deadline", "deadlines": "deadline",
+    "summary": "summarize", "summarise": "summarize", "summarized": "summarize",
+    "summarised": "summarize",
+    "mark": "grade", "marks": "grade", "marked": "graded", "marking": "grading",
+}
+
+
+def normalize_question(question: str) -> list[str]:
+    """
+    Lowercases, tokenizes, drops stop words, maps synonyms and strips common suffixes.
+    Question words and negations are kept as "?<word>" and "!not" tokens. The label after a
+    noun like "part" or "lecture" is kept as is, with roman numerals turned into numbers.
+    """
+    tokens = re.findall(r"[a-z0-9]+", question.lower().replace("'", "").replace("\u2019", ""))
+    normalized = []
+    for previous, token in zip([None] + tokens, tokens):
+        if previous in LABEL_NOUNS and (len(token) == 1 or token in ROMAN_NUMERALS):
+            normalized.append(ROMAN_NUMERALS.get(token, token))
+            continue
+        if token in STOP_WORDS:
+            continue
+        if token in QUESTION_WORDS:
+            normalized.append(f"?{QUESTION_WORDS[token]}")
+            continue
+        if token in NEGATIONS:
+            normalized.append("!not")
+            continue
+        token = SYNONYMS.get(token, token)
+        for suffix in ("ing", "ed", "es", "s"):
+            if len(token) > len(suffix) + 2 and token.endswith(suffix):
+                token = token[:-len(suffix)]
+                break
+        normalized.append(token)
+    return normalized
+
+
+def _required(tokens):
+    """
+    Tokens that must match exactly for a hit: numbers ("assignment 3" vs "assignment 4"),
+    single letters ("part a" vs "part b"), the question word ("when" vs "where") and
+    negation ("is" vs "isn't").
+    """
+    return frozenset(token for token in tokens if token.isdigit() or len(token) == 1 or token[0] in "?!")
+
+
+def _features(tokens):
+    """Word and character-trigram counts of a normalized question's content words."""
+    tokens = [token for token in tokens if token[0] not in "?!"]
+    features = Counter(f"w:{token}" for token in tokens)
+    for token in tokens:
+        padded = f" {token} "
+        features.update(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+    return features
+
+
+def _tfidf(features, document_frequency, corpus_size):
+    vector = {}
+    for feature, count in features.items():
+        idf = math.log((1 + corpus_size) / (1 + document_frequency.get(feature, 0))) + 1
+        vector[feature] = (1 + math.log(count)) * idf
+    norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+    return {feature: weight / norm for feature, weight in vector.items()}
+
+
+def _cosine(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(weight * b.get(feature, 0.0) for feature, weight in a.items())
+
+
+class SemanticAnswerCache:
+    """Thread-safe answer cache keyed by document, matching questions by TF-IDF similarity."""
+
+    def __init__(self, threshold=None):
+        self.threshold = SIMILARITY_THRESHOLD if threshold is None else threshold
+        self.documents = {}  # document key -> {"fingerprint": str, "entries": [dict]}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.latency_saved_seconds = 0.0
+
+    def _document(self, document_key, fingerprint):
+        """Returns the document's entry list, dropping it first if the document changed."""
+        document = self.documents.pop(document_key, None)
+        if document is not None and document["fingerprint"] != fingerprint:
+            self.invalidations += 1
+            document = None
+        if document is None:
+            document = {"fingerprint": fingerprint, "entries": []}
+        # Re-insert to keep the dict ordered from least to most recently used
+        self.documents[document_key] = document
+        while len(self.documents) > MAX_DOCUMENTS:
+            self.documents.pop(next(iter(self.documents)))
+        return document["entries"]
+
+    def lookup(self, document_key, fingerprint, question, llm_choices):
+        """
+        Returns a cached answer for a similar question about the same document, or None.
+        Only answers produced by one of llm_choices are considered.
+        """
+        tokens = normalize_question(question)
+        features = _features(tokens)
+        required = _required(tokens)
+        llm_choices = {llm_choice.lower() for llm_choice in llm_choices}
+        with self.lock:
+            entries = [entry for entry in self._document(document_key, fingerprint)
+                       if entry["llm_choice"] in llm_choices and entry["required"] == required]
+            best_entry, best_similarity = None, 0.0
+            if features and entries:
+                document_frequency = Counter()
+                for entry in entries:
+                    document_frequency.update(entry["features"].keys())
+                document_frequency.update(features.keys())
+                corpus_size = len(entries) + 1
+                query = _tfidf(features, document_frequency, corpus_size)
+                for entry in entries:
+                    similarity = _cosine(query, _tfidf(entry["features"], document_frequency, corpus_size))
+                    if similarity > best_similarity:
+                        best_entry, best_similarity = entry, similarity
+
+            if best_entry is not None and best_similarity >= self.threshold:
+                self.hits += 1
+                self.latency_saved_seconds += best_entry["latency_seconds"]
+                print(f"Semantic cache hit ({best_similarity:.2f}): '{question}' ~ '{best_entry['question']}'")
+                return best_entry["answer"]
+            self.misses += 1
+            return None
+
+    def store(self, document_key, fingerprint, question, llm_choice, answer, latency_seconds):
+        """Caches an answer under the LLM choice that produced it, with how long it took."""
+        tokens = normalize_question(question)
+        features = _features(tokens)
+        if not features:
+            return
+        with self.lock:
+            entries = self._document(document_key, fingerprint)
+            entries.append({
+                "question": question,
+                "llm_choice": llm_choice.lower(),
+                "features": features,
+                "required": _required(tokens),
+                "answer": answer,
+                "latency_seconds": latency_seconds,
+            })
+            del entries[:-MAX_ENTRIES_PER_DOCUMENT]
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "latency_saved_seconds": round(self.latency_saved_seconds, 2),
+                "invalidations": self.invalidations,
+                "documents": len(self.documents),
+                "entries": sum(len(document["entries"]) for document in self.documents.values()),
+                "threshold": self.threshold,
+            }
+
+
+answer_cache = SemanticAnswerCache()
@@ -0,0 +1,12 @@
+# backend/tests/conftest.py
+
+import os
+import sys
+
+# Backend modules import each other as top-level modules (run from backend/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep LiteLLM from fetching its model price list over the network on import
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+# llm_chat builds its DeepSeek client at import time; tests never call the real providers
+os.environ.setdefault("DEEPSEEK_API_KEY", "test-key")
@@ -0,0 +1,41 @@
+# backend/tests/test_gzip_request.py
+import gzip
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+GZIP_HEADERS = {"Content-Encoding": "gzip", "Content-Type": "application/json"}
+
+
+@pytest.fixture
+def client():
+    return TestClient(main.app)
+
+
+def test_gzip_body_is_decompressed(client):
+    body = gzip.compress(json.dumps({"question": "q"}).encode())
+    response = client.post("/estimate_cost/", content=body, headers=GZIP_HEADERS)
+    # Reaches the endpoint's validation: the JSON was decoded, llm_choice is missing
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", "llm_choice"]
+
+
+def test_malformed_gzip_body_is_rejected(client):
+    response = client.post("/estimate_cost/", content=b"not gzip", headers=GZIP_HEADERS)
+    assert response.status_code == 400
+
+
+def test_truncated_gzip_body_is_rejected(client):
+    body = gzip.compress(json.dumps({"question": "q" * 100}).encode())
+    response = client.post("/estimate_cost/", content=body[:-10], headers=GZIP_HEADERS)
+    assert response.status_code == 400
+
+
+def test_oversized_gzip_body_is_rejected(client, monkeypatch):
+    monkeypatch.setattr(main, "MAX_DECOMPRESSED_BODY_BYTES", 1000)
+    body = gzip.compress(b"0" * 10_000_000)
+    response = client.post("/estimate_cost/", content=body, headers=GZIP_HEADERS)
+    assert response.status_code == 413
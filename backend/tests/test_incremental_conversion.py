@@ -0,0 +1,110 @@
+# backend/tests/test_incremental_conversion.py
+import hashlib
+import io
+import json
+
+import boto3
+import fitz
+import pytest
+from botocore.response import StreamingBody
+from botocore.stub import ANY, Stubber
+
+import pdf_markdown_convertor as convertor
+
+BUCKET = "course-bucket"
+
+
+def make_deck(path, page_texts):
+    """A small deck with a title, a line of text and a distinct image on every page."""
+    doc = fitz.open()
+    for number, text in enumerate(page_texts, start=1):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Slide {number}", fontsize=20)
+        page.insert_text((72, 110), text, fontsize=12)
+        pixmap = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 8, 8), False)
+        pixmap.set_rect(pixmap.irect, (40 * number, 80, 120))
+        page.insert_image(fitz.Rect(72, 200, 152, 280), pixmap=pixmap)
+    doc.save(path)
+    doc.close()
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    client = boto3.client("s3", region_name="us-east-2",
+                          aws_access_key_id="test", aws_secret_access_key="test")
+    monkeypatch.setattr(convertor, "s3_client", client)
+    monkeypatch.setattr(convertor, "S3_BUCKET_NAME", BUCKET)
+
+    # Images go through upload_file (s3transfer); record them instead of stubbing transfers
+    uploaded_images = []
+    def upload_file_to_s3(file_path, s3_key):
+        uploaded_images.append(s3_key)
+        return f"https://{BUCKET}.s3.amazonaws.com/{s3_key}"
+    monkeypatch.setattr(convertor, "upload_file_to_s3", upload_file_to_s3)
+
+    # Capture what was written, so the next conversion can read the manifest back
+    written = {}
+    def capture(params, **kwargs):
+        written[params["Key"]] = params.get("Body")
+    client.meta.events.register("provide-client-params.s3.PutObject", capture)
+
+    with Stubber(client) as stubber:
+        yield stubber, written, uploaded_images
+        stubber.assert_no_pending_responses()
+
+
+def expect_publish(stubber, version):
+    """The writes of one published version, in the order they must happen."""
+    stubber.add_response("put_object", {}, {
+        "Bucket": BUCKET, "Key": ANY, "Body": ANY, "ContentType": "application/json"})
+    stubber.add_response("put_object", {}, {
+        "Bucket": BUCKET, "Key": f"Conversions/Deck/v{version}.md", "Body": ANY,
+        "ContentType": "text/markdown", "Metadata": ANY})
+    stubber.add_response("copy_object", {}, {
+        "Bucket": BUCKET, "Key": "Markdowns/Deck.md",
+        "CopySource": {"Bucket": BUCKET, "Key": f"Conversions/Deck/v{version}.md"}})
+    stubber.add_response("put_object", {}, {
+        "Bucket": BUCKET, "Key": "Conversions/Deck/manifest.json", "Body": ANY,
+        "ContentType": "application/json"})
+
+
+def test_revised_deck_only_reextracts_changed_pages(s3, tmp_path):
+    stubber, written, uploaded_images = s3
+    manifest_request = {"Bucket": BUCKET, "Key": "Conversions/Deck/manifest.json"}
+    pdf_path = str(tmp_path / "Deck.pdf")
+
+    # First conversion: no manifest yet, every page extracted
+    make_deck(pdf_path, ["alpha", "beta", "gamma"])
+    stubber.add_client_error("get_object", service_error_code="NoSuchKey", http_status_code=404,
+                             expected_params=manifest_request)
+    expect_publish(stubber, version=1)
+    assert convertor.pdf_to_markdown_s3(pdf_path).endswith("Markdowns/Deck.md")
+    first_manifest = written["Conversions/Deck/manifest.json"]
+    first_pages = json.loads(first_manifest)["pages"]
+    assert len(uploaded_images) == 3
+
+    # Revised deck: only slide 2 changed
+    make_deck(pdf_path, ["alpha", "beta (revised)", "gamma"])
+    stubber.add_response("get_object", {"Body": StreamingBody(io.BytesIO(first_manifest), len(first_manifest))},
+                         manifest_request)
+    expect_publish(stubber, version=2)
+    result = convertor.pdf_to_markdown_s3_incremental(pdf_path)
+
+    assert result["version"] == 2
+    assert result["pages_total"] == 3
+    assert result["pages_reextracted"] == 1
+    # One new image, named by the changed page's hash; the others are reused as uploaded
+    assert len(uploaded_images) == 4
+    second_pages = json.loads(written["Conversions/Deck/manifest.json"])["pages"]
+    assert second_pages[0] == first_pages[0] and second_pages[2] == first_pages[2]
+    assert second_pages[1]["hash"] != first_pages[1]["hash"]
+    assert second_pages[1]["hash"][:16] in uploaded_images[-1]
+
+    markdown = written["Conversions/Deck/v2.md"].decode("utf-8")
+    # The index for this version was written under its content hash
+    content_hash = hashlib.sha256(markdown.encode("utf-8")).hexdigest()
+    assert json.loads(written[convertor.markdown_index_key("Deck", content_hash)])["content_hash"] == content_hash
+    assert markdown.startswith("# Extracted Content from Deck\n\n## Slide 1\n\nalpha\n\n")
+    assert "## Slide 2\n\nbeta (revised)\n\n" in markdown
+    assert first_pages[2]["markdown"] in markdown
+    assert markdown.count("![Image](") == 3
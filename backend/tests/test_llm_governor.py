@@ -0,0 +1,134 @@
+# backend/tests/test_llm_governor.py
+
+import threading
+
+import pytest
+
+import llm_governor
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+
+class ContextLengthExceeded(Exception):
+    status_code = 400
+
+
+@pytest.fixture(autouse=True)
+def fresh_governors(monkeypatch):
+    monkeypatch.setattr(llm_governor, "_governors", {})
+    monkeypatch.setattr(llm_governor, "BACKOFF_BASE_SECONDS", 0.001)
+    monkeypatch.setattr(llm_governor, "BREAKER_COOLDOWN_SECONDS", 0.05)
+
+
+def failing_then(results):
+    """Returns a callable that raises or returns the given results in order."""
+    results = list(results)
+
+    def call():
+        result = results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+    return call
+
+
+def test_each_429_shrinks_concurrency_limit_before_retrying():
+    call = failing_then([RateLimited("slow down")] * 3 + ["ok"])
+
+    assert llm_governor.governed_call("openai", 10, call) == "ok"
+
+    governor = llm_governor.get_governor("openai")
+    # 8 -> 4 -> 2 -> 1, and a throttled success does not grow it back
+    assert governor.stats()["concurrency_limit"] == 1
+    assert governor.stats()["in_flight"] == 0
+    assert governor.breaker.state() == "closed"
+
+
+def test_retries_exhausted_raises_429():
+    call = failing_then([RateLimited("slow down")] * (llm_governor.MAX_RETRIES + 1))
+
+    with pytest.raises(llm_governor.ProviderRateLimitedError) as excinfo:
+        llm_governor.governed_call("openai", 10, call)
+    assert excinfo.value.status_code == 429
+
+
+def test_breaker_opens_then_half_open_trial_closes_it():
+    for _ in range(llm_governor.BREAKER_FAILURE_THRESHOLD):
+        with pytest.raises(llm_governor.LLMProviderError):
+            llm_governor.governed_call("claude", 10, failing_then([ValueError("down")]))
+
+    breaker = llm_governor.get_governor("claude").breaker
+    assert breaker.state() == "open"
+    with pytest.raises(llm_governor.ProviderUnavailableError) as excinfo:
+        llm_governor.governed_call("claude", 10, failing_then(["never called"]))
+    assert excinfo.value.status_code == 503
+
+    # After the cooldown a single trial is let through; its success closes the breaker
+    threading.Event().wait(0.06)
+    assert llm_governor.governed_call("claude", 10, failing_then(["back"])) == "back"
+    assert breaker.state() == "closed"
+
+
+def test_failed_half_open_trial_reopens_breaker():
+    breaker = llm_governor.get_governor("claude").breaker
+    for _ in range(llm_governor.BREAKER_FAILURE_THRESHOLD):
+        breaker.record_failure()
+    threading.Event().wait(0.06)
+
+    with pytest.raises(llm_governor.LLMProviderError):
+        llm_governor.governed_call("claude", 10, failing_then([ValueError("still down")]))
+    assert breaker.state() == "open"
+
+
+def test_queue_depth_exceeded_returns_429(monkeypatch):
+    monkeypatch.setattr(llm_governor, "MAX_QUEUE_DEPTH", 0)
+    governor = llm_governor.get_governor("gemini")
+    release = threading.Event()
+    holders = [
+        threading.Thread(target=llm_governor.governed_call, args=("gemini", 10, release.wait))
+        for _ in range(governor.max_concurrency)
+    ]
+    for holder in holders:
+        holder.start()
+    for _ in range(100):
+        if governor.stats()["in_flight"] == governor.max_concurrency:
+            break
+        threading.Event().wait(0.01)
+    assert governor.stats()["in_flight"] == governor.max_concurrency
+
+    with pytest.raises(llm_governor.ProviderOverloadedError) as excinfo:
+        llm_governor.governed_call("gemini", 10, failing_then(["queued"]))
+    assert excinfo.value.status_code == 429
+
+    release.set()
+    for holder in holders:
+        holder.join()
+    assert governor.stats()["in_flight"] == 0
+
+
+def test_stream_retries_before_first_chunk_only():
+    attempts = []
+
+    def make_stream():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RateLimited("slow down")
+        yield "a"
+        yield "b"
+
+    assert list(llm_governor.governed_stream("deepseek", 10, make_stream)) == ["a", "b"]
+    assert len(attempts) == 2
+    assert llm_governor.get_governor("deepseek").stats()["concurrency_limit"] == 2
+
+
+def test_rejected_requests_do_not_open_breaker():
+    for _ in range(llm_governor.BREAKER_FAILURE_THRESHOLD + 1):
+        with pytest.raises(llm_governor.ProviderRequestError) as excinfo:
+            llm_governor.governed_call("openai", 10, failing_then([ContextLengthExceeded("too long")]))
+        # Passed through as the provider's 4xx, without retries
+        assert excinfo.value.status_code == 400
+
+    assert llm_governor.get_governor("openai").stats()["circuit"] == "closed"
+    assert llm_governor.governed_call("openai", 10, failing_then(["healthy"])) == "healthy"
@@ -0,0 +1,146 @@
+# backend/tests/test_llm_router.py
+
+import threading
+import time
+
+import pytest
+
+import llm_governor
+import llm_router
+
+
+class FakeProviderStream:
+    """Stands in for an SDK stream object that another thread can close."""
+
+    def __init__(self):
+        self.closed = threading.Event()
+
+    def close(self):
+        self.closed.set()
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(llm_router, "_provider_stats", {})
+    monkeypatch.setattr(llm_governor, "_governors", {})
+    monkeypatch.setattr(llm_router, "count_tokens", lambda text, model: 10)
+    monkeypatch.setattr(llm_router, "MIN_HEDGE_AFTER_SECONDS", 0.0)
+
+
+def fake_providers(monkeypatch, behaviours):
+    """
+    behaviours maps an LLM choice to 'slow', 'fail', 'reject' (a 4xx for this request),
+    ('delay', seconds, answer) or an answer string.
+    """
+    def stream(prompt_text, llm_choice, on_open=None):
+        behaviour = behaviours[llm_choice]
+        if isinstance(behaviour, tuple):
+            time.sleep(behaviour[1])
+            yield behaviour[2]
+        elif behaviour == "slow":
+            response = FakeProviderStream()
+            on_open(response)
+            # Block like a stalled provider until the router closes the stream
+            if response.closed.wait(timeout=5):
+                raise ConnectionError("stream closed")
+            yield "too late"
+        elif behaviour == "fail":
+            raise ValueError(f"{llm_choice} is broken")
+        elif behaviour == "reject":
+            raise llm_governor.ProviderRequestError(f"{llm_choice}: context_length_exceeded")
+        else:
+            yield behaviour
+    monkeypatch.setattr(llm_router, "stream_llm_response", stream)
+
+
+def test_hedge_wins_and_slow_attempt_is_cancelled(monkeypatch):
+    fake_providers(monkeypatch, {"gpt-4o": "slow", "DeepSeek": "hedged answer"})
+
+    answer, answered_by = llm_router.route_llm_response("prompt", ["gpt-4o", "DeepSeek"], hedge_after_seconds=0.05)
+
+    assert (answer, answered_by) == ("hedged answer", "DeepSeek")
+    # Closing the stalled stream frees its governor slot right away
+    deadline = time.monotonic() + 1
+    while llm_governor.get_governor("openai").in_flight and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert llm_governor.get_governor("openai").in_flight == 0
+    # The abandoned provider gets a latency sample but is not counted as an error
+    stats = llm_router.get_provider_stats()["gpt-4o"]
+    assert stats["median_first_token_seconds"] >= 0.05
+    assert stats["error_rate"] == 0.0
+
+
+def test_primary_answers_before_hedge_deadline(monkeypatch):
+    fake_providers(monkeypatch, {"gpt-4o": "primary answer", "DeepSeek": "fail"})
+
+    assert llm_router.route_llm_response("prompt", ["gpt-4o", "DeepSeek"]) == ("primary answer", "gpt-4o")
+    # The fallback was never started
+    assert llm_router.get_provider_stats()["deepseek"]["samples"] == 0
+
+
+def test_failed_primary_falls_back_immediately(monkeypatch):
+    fake_providers(monkeypatch, {"gpt-4o": "fail", "DeepSeek": "fallback answer"})
+
+    answer, answered_by = llm_router.route_llm_response("prompt", ["gpt-4o", "DeepSeek"], hedge_after_seconds=10)
+
+    assert (answer, answered_by) == ("fallback answer", "DeepSeek")
+    assert llm_router.get_provider_stats()["gpt-4o"]["error_rate"] == 1.0
+
+
+def test_all_providers_failing_raises_503(monkeypatch):
+    fake_providers(monkeypatch, {"gpt-4o": "fail", "DeepSeek": "fail"})
+
+    with pytest.raises(llm_governor.ProviderUnavailableError) as excinfo:
+        llm_router.route_llm_response("prompt", ["gpt-4o", "DeepSeek"], hedge_after_seconds=0.05)
+    assert excinfo.value.status_code == 503
+
+
+def test_unhealthy_provider_is_ranked_last():
+    for _ in range(llm_router.MIN_SAMPLES_FOR_HEALTH):
+        llm_router._get_stats("gpt-4o").record_error()
+
+    assert llm_router.rank_providers(["gpt-4o", "DeepSeek", "unknown model"]) == ["DeepSeek", "gpt-4o"]
+
+
+def test_unmeasured_primary_is_tried_before_measured_fallbacks():
+    llm_router._get_stats("DeepSeek").record_success(0.2)
+
+    assert llm_router.rank_providers(["gpt-4o", "DeepSeek"]) == ["gpt-4o", "DeepSeek"]
+
+
+def test_hedge_delay_is_clamped(monkeypatch):
+    monkeypatch.setattr(llm_router, "MIN_HEDGE_AFTER_SECONDS", 0.3)
+    fake_providers(monkeypatch, {"gpt-4o": ("delay", 0.1, "primary answer"), "DeepSeek": "hedged answer"})
+
+    answer, _ = llm_router.route_llm_response("prompt", ["gpt-4o", "DeepSeek"], hedge_after_seconds=0)
+
+    assert answer == "primary answer"
+    assert llm_router.get_provider_stats()["deepseek"]["samples"] == 0
+
+
+def test_uncancellable_provider_is_not_raced(monkeypatch):
+    fake_providers(monkeypatch, {"Gemini Flash Free": ("delay", 0.2, "gemini answer"), "DeepSeek": "hedged answer"})
+
+    answer, _ = llm_router.route_llm_response("prompt", ["Gemini Flash Free", "DeepSeek"], hedge_after_seconds=0.05)
+
+    assert answer == "gemini answer"
+    assert llm_router.get_provider_stats()["deepseek"]["samples"] == 0
+
+
+def test_uncancellable_provider_is_not_started_as_hedge(monkeypatch):
+    fake_providers(monkeypatch, {"gpt-4o": ("delay", 0.2, "primary answer"), "Gemini Flash Free": "gemini answer"})
+
+    answer, _ = llm_router.route_llm_response("prompt", ["gpt-4o", "Gemini Flash Free"], hedge_after_seconds=0.05)
+
+    assert answer == "primary answer"
+    assert llm_router.get_provider_stats()["gemini flash free"]["samples"] == 0
+
+
+def test_all_providers_rejecting_the_request_returns_4xx(monkeypatch):
+    fake_providers(monkeypatch, {"gpt-4o": "reject", "DeepSeek": "reject"})
+
+    with pytest.raises(llm_governor.ProviderRequestError) as excinfo:
+        llm_router.route_llm_response("prompt", ["gpt-4o", "DeepSeek"], hedge_after_seconds=0.05)
+    assert excinfo.value.status_code == 400
+    # Rejections are not counted against the providers' health
+    assert llm_router.get_provider_stats()["gpt-4o"]["error_rate"] == 0.0
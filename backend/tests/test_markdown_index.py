@@ -0,0 +1,129 @@
+# backend/tests/test_markdown_index.py
+import hashlib
+import io
+import json
+
+import boto3
+import pytest
+from botocore.response import StreamingBody
+from botocore.stub import Stubber
+
+import main
+from pdf_markdown_convertor import build_markdown_with_index
+
+BUCKET = "course-bucket"
+MARKDOWN_KEY = f"{main.S3_MARKDOWN_FOLDER}Deck.md"
+
+
+def body(data):
+    return StreamingBody(io.BytesIO(data), len(data))
+
+
+class Version:
+    """One published Markdown version: its bytes, index and ETag."""
+
+    def __init__(self, fragments):
+        md_content, self.index = build_markdown_with_index("# Extracted Content from Deck\n\n", fragments)
+        self.content = md_content.encode("utf-8")
+        self.etag = f'"{hashlib.md5(self.content).hexdigest()}"'
+
+    def page_range(self, page):
+        entry = self.index["pages"][page - 1]
+        return (0 if page == 1 else entry["start"]), entry["end"]
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    # A real client, so request parameters are validated against the S3 API model
+    client = boto3.client("s3", region_name="us-east-2",
+                          aws_access_key_id="test", aws_secret_access_key="test")
+    monkeypatch.setattr(main, "s3_client", client)
+    monkeypatch.setattr(main, "S3_BUCKET_NAME", BUCKET)
+    monkeypatch.setattr(main, "MARKDOWN_CACHE_DIR", None)
+    main._index_cache.clear()
+    with Stubber(client) as stubber:
+        yield stubber
+        stubber.assert_no_pending_responses()
+
+
+def expect_index_load(stubber, version):
+    stubber.add_response("head_object", {"ETag": version.etag,
+                                         "Metadata": {"content-hash": version.index["content_hash"]}},
+                         {"Bucket": BUCKET, "Key": MARKDOWN_KEY})
+    index_key = f"{main.S3_INDEX_FOLDER}Deck/{version.index['content_hash']}.json"
+    stubber.add_response("get_object", {"Body": body(json.dumps(version.index).encode())},
+                         {"Bucket": BUCKET, "Key": index_key})
+
+
+def expect_range(stubber, version, start, end, served=None):
+    """A ranged GET conditional on the version's ETag; `served` answers it with another version."""
+    params = {"Bucket": BUCKET, "Key": MARKDOWN_KEY, "Range": f"bytes={start}-{end - 1}", "IfMatch": version.etag}
+    if served is not None and served is not version:
+        stubber.add_client_error("get_object", service_error_code="PreconditionFailed",
+                                 http_status_code=412, expected_params=params)
+    else:
+        stubber.add_response("get_object", {"Body": body(version.content[start:end])}, params)
+
+
+def read(page=None, section=None):
+    request = main.MarkdownRequest(markdown_filename="Deck.md", page=page, section=section)
+    return main.get_markdown_content(request)
+
+
+def test_serves_pages_and_sections_by_range(s3):
+    version = Version(["## Intro\n\nhello\n\n", "## Résumé\n\nnaïve café\n\n"])
+    expect_index_load(s3, version)
+    expect_range(s3, version, *version.page_range(2))
+    second = read(page=2)
+    assert second["markdown_content"] == "## Résumé\n\nnaïve café\n\n"
+    assert second["total_pages"] == 2
+    assert second["sections"] == ["Extracted Content from Deck", "Intro", "Résumé"]
+
+    section = version.index["sections"][1]
+    expect_range(s3, version, section["start"], section["end"])
+    assert read(section=1)["markdown_content"] == "## Intro\n\nhello\n\n"
+
+
+def test_stale_index_is_reloaded_when_markdown_changes(s3):
+    old = Version(["## Intro\n\nhello\n\n", "## Two\n\nsecond\n\n"])
+    new = Version(["## Intro\n\nmuch longer first page ✓\n\n", "## Two\n\nrevised\n\n"])
+    expect_index_load(s3, old)
+    expect_range(s3, old, *old.page_range(2))
+    assert read(page=2)["markdown_content"] == "## Two\n\nsecond\n\n"
+
+    # A revised upload replaced the Markdown while the old index is still cached
+    expect_range(s3, old, *old.page_range(2), served=new)
+    expect_index_load(s3, new)
+    expect_range(s3, new, *new.page_range(2))
+    assert read(page=2)["markdown_content"] == "## Two\n\nrevised\n\n"
+
+
+def test_local_cache_is_tied_to_the_indexed_object(s3, monkeypatch, tmp_path):
+    monkeypatch.setattr(main, "MARKDOWN_CACHE_DIR", str(tmp_path))
+    old = Version(["## Intro\n\nhello\n\n", "## Two\n\nsecond\n\n"])
+    new = Version(["## Intro\n\nmuch longer first page\n\n", "## Two\n\nrevised\n\n"])
+    whole_object = {"Bucket": BUCKET, "Key": MARKDOWN_KEY, "IfMatch": old.etag}
+
+    expect_index_load(s3, old)
+    s3.add_response("get_object", {"Body": body(old.content)}, whole_object)
+    assert read(page=2)["markdown_content"] == "## Two\n\nsecond\n\n"
+    # Served from the local copy without further S3 calls
+    assert read(page=1)["markdown_content"].endswith("## Intro\n\nhello\n\n")
+
+    # The Markdown changes between loading the index and downloading: reload and retry
+    main._index_cache.clear()
+    stale = Version(["## Intro\n\nhello again\n\n", "## Two\n\nsecond\n\n"])
+    expect_index_load(s3, stale)
+    s3.add_client_error("get_object", service_error_code="PreconditionFailed", http_status_code=412,
+                        expected_params={**whole_object, "IfMatch": stale.etag})
+    expect_index_load(s3, new)
+    s3.add_response("get_object", {"Body": body(new.content)}, {**whole_object, "IfMatch": new.etag})
+    assert read(page=2)["markdown_content"] == "## Two\n\nrevised\n\n"
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted(
+        f"{version.etag.strip(chr(34))}_Deck.md" for version in (old, new))
+
+
+def test_markdown_without_index_is_served_whole(s3):
+    s3.add_response("head_object", {"ETag": '"legacy"', "Metadata": {}}, {"Bucket": BUCKET, "Key": MARKDOWN_KEY})
+    s3.add_response("get_object", {"Body": body(b"# Old\n\ntext\n\n")}, {"Bucket": BUCKET, "Key": MARKDOWN_KEY})
+    assert read(page=1) == {"markdown_content": "# Old\n\ntext\n\n", "page": 1, "total_pages": 1, "sections": []}
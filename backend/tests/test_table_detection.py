@@ -0,0 +1,76 @@
+# backend/tests/test_table_detection.py
+import fitz
+import pytest
+
+# reportlab only builds the test PDFs; it is not a runtime dependency
+canvas = pytest.importorskip("reportlab.pdfgen.canvas")
+
+from table_detection import TABLE_SCORE_THRESHOLD, score_page
+
+WORDS = ["storage", "latency", "schema", "vector", "pipeline", "query", "cluster", "index"]
+
+
+def sentence(i, words=12):
+    return " ".join(WORDS[(i + k) % len(WORDS)] for k in range(words)).capitalize() + "."
+
+
+def ruled_table(c):
+    x, y, rows, cols, width, height = 72, 700, 6, 4, 110, 20
+    for r in range(rows + 1):
+        c.line(x, y - r * height, x + cols * width, y - r * height)
+    for k in range(cols + 1):
+        c.line(x + k * width, y, x + k * width, y - rows * height)
+    for r in range(rows):
+        for k in range(cols):
+            c.drawString(x + k * width + 4, y - r * height - 14, f"{WORDS[(r + k) % len(WORDS)]} {r}")
+
+
+def whitespace_table(c):
+    for r in range(8):
+        x = 72
+        for k, width in enumerate((60, 90, 180, 70)):
+            c.drawString(x, 700 - r * 16, "Week" if r == 0 else WORDS[(r + k) % len(WORDS)])
+            x += width + 20
+
+
+def prose(c):
+    for line in range(45):
+        c.drawString(72, 740 - line * 14, sentence(line))
+
+
+def two_column_prose(c):
+    c.setFont("Times-Roman", 9)
+    for x in (54, 316):
+        for line in range(60):
+            c.drawString(x, 750 - line * 11.5, sentence(line, words=7)[:52])
+
+
+def box_diagram(c):
+    for i, label in enumerate(["Ingest", "Transform", "Serve"]):
+        c.rect(60 + i * 180, 500, 120, 60)
+        c.drawString(80 + i * 180, 525, label)
+        if i:
+            c.line(180 + (i - 1) * 180, 530, 240 + (i - 1) * 180, 530)
+
+
+@pytest.fixture
+def page_score(tmp_path):
+    def score(draw):
+        path = tmp_path / f"{draw.__name__}.pdf"
+        c = canvas.Canvas(str(path))
+        draw(c)
+        c.showPage()
+        c.save()
+        with fitz.open(path) as doc:
+            return score_page(doc[0])
+    return score
+
+
+@pytest.mark.parametrize("draw", [ruled_table, whitespace_table])
+def test_tables_are_candidates(page_score, draw):
+    assert page_score(draw) >= TABLE_SCORE_THRESHOLD
+
+
+@pytest.mark.parametrize("draw", [prose, two_column_prose, box_diagram])
+def test_non_tables_are_skipped(page_score, draw):
+    assert page_score(draw) < TABLE_SCORE_THRESHOLD
@@ -1,34 +1,7 @@
 import streamlit as st
-import requests
 import json
-import boto3
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
-
-AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
-AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
-AWS_DEFAULT_REGION = os.getenv("AWS_DEFAULT_REGION", "us-east-2")
-S3_BUCKET_NAME = os.getenv("S3_BUCKET_NAME")
-S3_MARKDOWN_FOLDER = "Markdowns/"
-
-# Backend Endpoints
-UPLOAD_URL = "https://assignment-4-part-1.onrender.com/upload_pdf/"
-CONVERT_PDF_MARKDOWN_URL = "https://assignment-4-part-1.onrender.com/convert_pdf_markdown/"
-CHAT_URL = "https://assignment-4-part-1.onrender.com/chat/"
-ESTIMATE_COST_URL = "https://assignment-4-part-1.onrender.com/estimate_cost/"  # new endpoint for cost estimation
-FETCH_MARKDOWN_URL = "https://assignment-4-part-1.onrender.com/fetch_markdown_files/"
-GET_MARKDOWN_CONTENT_URL = "https://assignment-4-part-1.onrender.com/get_markdown_content/"
-SUMMARIZE_URL = "https://assignment-4-part-1.onrender.com/summarize/"
-
-# Initialize S3 Client (if needed)
-s3_client = boto3.client(
-    "s3",
-    aws_access_key_id=AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-    region_name=AWS_DEFAULT_REGION,
-)
+import backend_client
+from backend_client import BackendError
 
 # Use session state to avoid re-running PDF extraction on every UI interaction
 if "pdf_data" not in st.session_state:
@@ -52,71 +25,85 @@ if input_method == "Upload PDF":
         if st.button("Clear Loaded PDF", key="clear_pdf"):
             st.session_state.pdf_data = None
             st.session_state.pdf_filename = None
-            st.experimental_rerun()
+            st.rerun()
     else:
         uploaded_file = st.file_uploader("📂 Choose a PDF file", type=["pdf"], key="upload_pdf")
         if uploaded_file is not None:
             file_bytes = uploaded_file.getvalue()
             with st.spinner("⏳ Extracting PDF content..."):
-                files = {"file": (uploaded_file.name, file_bytes, "application/pdf")}
-                response = requests.post(UPLOAD_URL, files=files)
-                if response.status_code == 200:
-                    st.session_state.pdf_data = response.json()
+                try:
+                    st.session_state.pdf_data = backend_client.upload_pdf(uploaded_file.name, file_bytes)
                     st.session_state.pdf_filename = uploaded_file.name
                     st.success(f"✅ PDF content extracted successfully for '{uploaded_file.name}'!")
-                else:
+                except BackendError:
                     st.error("❌ Failed to extract PDF content")
                     st.session_state.pdf_data = None
 
 # ------------------- Mode 2: Use Existing Markdown ---------------------- #
 elif input_method == "Use Existing Markdown":
     st.header("Use a Markdown File from S3")
-    def fetch_markdown_files():
-        """Fetch Markdown files stored in S3."""
-        response = requests.get(FETCH_MARKDOWN_URL)
-        if response.status_code == 200:
-            return response.json().get("markdown_files", [])
-        return []
-    markdown_files = fetch_markdown_files()
+    try:
+        markdown_files = backend_client.fetch_markdown_files()
+    except BackendError:
+        markdown_files = []
     if markdown_files:
         selected_md = st.selectbox("📜 Select a Markdown file:", markdown_files, key="markdown_select")
         if st.button("🔍 View Markdown Content", key="view_markdown"):
             if selected_md:
-                response = requests.post(
-                    GET_MARKDOWN_CONTENT_URL,
-                    json={"markdown_filename": selected_md}
-                )
-                if response.status_code == 200:
-                    markdown_text = response.json().get("markdown_content", "")
-                    st.text_area("📄 Markdown Content", markdown_text, height=300, key="markdown_text")
-                else:
-                    st.error(f"❌ Failed to retrieve Markdown content: {response.text}")
+                st.session_state.viewer_file = selected_md
+                st.session_state.viewer_pages_loaded = 1
             else:
                 st.warning("⚠️ Please select a Markdown file.")
+
+        # Pages are fetched one at a time and only when the user asks for more
+        if st.session_state.get("viewer_file") == selected_md:
+            try:
+                pages = [backend_client.get_markdown_page(selected_md, page)
+                         for page in range(1, st.session_state.viewer_pages_loaded + 1)]
+                markdown_text = "".join(page.get("markdown_content", "") for page in pages)
+                total_pages = pages[-1].get("total_pages", 1)
+                st.text_area(
+                    f"📄 Markdown Content (pages 1-{len(pages)} of {total_pages})",
+                    markdown_text, height=300, key=f"markdown_text_{selected_md}_{len(pages)}"
+                )
+                if len(pages) < total_pages and st.button("⬇️ Load next page", key="load_next_page"):
+                    st.session_state.viewer_pages_loaded += 1
+                    st.rerun()
+            except BackendError as e:
+                st.error(f"❌ Failed to retrieve Markdown content: {e}")
     else:
         st.warning("⚠️ No Markdown files found in S3.")
 
 # ------------------- Mode 3: Convert PDF to Markdown -------------------- #
 elif input_method == "Convert PDF to Markdown":
     st.header("Convert PDF to Markdown & Upload to S3")
+    update_existing = st.checkbox("🔄 Revised version (only re-convert changed pages)", key="update_existing")
     uploaded_pdf = st.file_uploader("Select a PDF to convert", type=["pdf"], key="convert_pdf")
     if uploaded_pdf is not None:
         with st.spinner("⏳ Checking & Converting..."):
             file_bytes = uploaded_pdf.getvalue()
-            files = {"file": (uploaded_pdf.name, file_bytes, "application/pdf")}
-            resp = requests.post(CONVERT_PDF_MARKDOWN_URL, files=files)
-            if resp.status_code == 200:
-                data = resp.json()
+            try:
+                data = backend_client.convert_pdf_markdown(uploaded_pdf.name, file_bytes, update=update_existing)
                 st.success("✅ PDF converted to Markdown and uploaded to S3!")
                 st.write("**Markdown URL:**", data.get("markdown_url"))
-            else:
-                st.error(f"❌ Could not convert PDF. {resp.text}")
+                if update_existing:
+                    st.write(f"**Version:** {data.get('version')} "
+                             f"({data.get('pages_reextracted')} of {data.get('pages_total')} pages re-converted "
+                             f"in {data.get('seconds')}s)")
+            except BackendError as e:
+                st.error(f"❌ Could not convert PDF. {e}")
 
 # --------------------- LLM Chat Section ---------------------------- #
 # Only display chat if user selected "Upload PDF" or "Use Existing Markdown"
 if input_method in ("Upload PDF", "Use Existing Markdown"):
     st.header("💬 Ask a Question")
-    llm_option = st.selectbox("🤖 Select LLM", ["gpt-4o", "Gemini Flash Free", "DeepSeek", "Claude-3.5 Haiku"], key="llm_option")
+    llm_options = ["gpt-4o", "Gemini Flash Free", "DeepSeek", "Claude-3.5 Haiku"]
+    llm_option = st.selectbox("🤖 Select LLM", llm_options, key="llm_option")
+    fallback_llms = st.multiselect(
+        "🔁 Fallback LLMs (used if the selected LLM is slow or failing)",
+        [option for option in llm_options if option != llm_option],
+        key="fallback_llms"
+    )
     user_question = st.text_input("📝 Your question:", key="user_question")
     
     # Add a new button to estimate token count and cost
@@ -147,16 +134,15 @@ if input_method in ("Upload PDF", "Use Existing Markdown"):
 
         if data:
             with st.spinner("⏳ Estimating..."):
-                est_resp = requests.post(ESTIMATE_COST_URL, json=data)
-                if est_resp.status_code == 200:
-                    est_data = est_resp.json()
+                try:
+                    est_data = backend_client.estimate_cost(json.dumps(data, sort_keys=True))
                     token_count = est_data.get("token_count", 0)
                     estimated_cost = est_data.get("estimated_cost", 0.0)
                     st.success("✅ Estimation complete!")
                     st.write(f"**Token Count:** {token_count}")
                     st.write(f"**Estimated Cost:** ${estimated_cost:.4f}")
-                else:
-                    st.error("❌ Failed to estimate cost: " + est_resp.text)
+                except BackendError as e:
+                    st.error(f"❌ Failed to estimate cost: {e}")
     
     # Button to send question
     if st.button("🚀 Send Question", key="send_question"):
@@ -165,7 +151,8 @@ if input_method in ("Upload PDF", "Use Existing Markdown"):
                 data = {
                     "question": user_question,
                     "pdf_json": json.dumps(st.session_state.pdf_data),
-                    "llm_choice": llm_option
+                    "llm_choice": llm_option,
+                    "fallback_llms": fallback_llms
                 }
             else:
                 st.warning("⚠️ Please upload a PDF first.")
@@ -175,7 +162,8 @@ if input_method in ("Upload PDF", "Use Existing Markdown"):
                 data = {
                     "question": user_question,
                     "markdown_filename": selected_md,
-                    "llm_choice": llm_option
+                    "llm_choice": llm_option,
+                    "fallback_llms": fallback_llms
                 }
             else:
                 st.warning("⚠️ Please select a Markdown file.")
@@ -186,12 +174,11 @@ if input_method in ("Upload PDF", "Use Existing Markdown"):
 
         if data:
             with st.spinner("⏳ Generating answer..."):
-                response = requests.post(CHAT_URL, json=data)
-                if response.status_code == 200:
-                    answer = response.json().get("answer", "No answer received.")
+                try:
+                    answer = backend_client.chat(data).get("answer", "No answer received.")
                     st.write("💡 **Answer:**", answer)
-                else:
-                    st.error("❌ Error from backend: " + response.text)
+                except BackendError as e:
+                    st.error(f"❌ Error from backend: {e}")
     
     # ----------------- New Summarize Button ----------------- #
     if st.button("📝 Summarize", key="summarize_button"):
@@ -201,7 +188,8 @@ if input_method in ("Upload PDF", "Use Existing Markdown"):
                 data = {
                     "question": summary_question,
                     "pdf_json": json.dumps(st.session_state.pdf_data),
-                    "llm_choice": llm_option
+                    "llm_choice": llm_option,
+                    "fallback_llms": fallback_llms
                 }
             else:
                 st.warning("⚠️ Please upload a PDF first.")
@@ -211,7 +199,8 @@ if input_method in ("Upload PDF", "Use Existing Markdown"):
                 data = {
                     "question": summary_question,
                     "markdown_filename": selected_md,
-                    "llm_choice": llm_option
+                    "llm_choice": llm_option,
+                    "fallback_llms": fallback_llms
                 }
             else:
                 st.warning("⚠️ Please select a Markdown file.")
@@ -221,9 +210,8 @@ if input_method in ("Upload PDF", "Use Existing Markdown"):
 
         if data:
             with st.spinner("⏳ Generating summary..."):
-                response = requests.post(SUMMARIZE_URL, json=data)
-                if response.status_code == 200:
-                    summary = response.json().get("answer", "No summary received.")
+                try:
+                    summary = backend_client.summarize(data).get("answer", "No summary received.")
                     st.write("💡 **Summary:**", summary)
-                else:
-                    st.error("❌ Error from backend: " + response.text)
+                except BackendError as e:
+                    st.error(f"❌ Error from backend: {e}")
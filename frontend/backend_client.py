@@ -0,0 +1,113 @@
+# frontend/backend_client.py
+
+import gzip
+import json
+import os
+
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Backend base URL
+BACKEND_URL = os.getenv("BACKEND_URL", "https://assignment-4-part-1.onrender.com").rstrip("/")
+
+# Request bodies larger than this are gzip-compressed before upload
+COMPRESS_MIN_BYTES = 1024
+
+# Cache lifetimes (seconds)
+MARKDOWN_LIST_TTL = 60
+MARKDOWN_CONTENT_TTL = 300
+COST_ESTIMATE_TTL = 600
+
+
+class BackendError(Exception):
+    """The backend answered with a non-200 status; the message is the response body."""
+
+    def __init__(self, status_code, message):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@st.cache_resource
+def get_session() -> requests.Session:
+    """One keep-alive session shared by all reruns, so calls reuse pooled TLS connections."""
+    session = requests.Session()
+    retries = Retry(total=2, backoff_factor=0.5, status_forcelist=[502, 503, 504], allowed_methods=["GET"])
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=10, max_retries=retries)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Accept-Encoding": "gzip, deflate"})
+    return session
+
+
+def _request(method, endpoint, **kwargs):
+    response = get_session().request(method, f"{BACKEND_URL}{endpoint}", **kwargs)
+    if response.status_code != 200:
+        raise BackendError(response.status_code, response.text)
+    return response.json()
+
+
+def _post_json(endpoint, payload):
+    """POSTs a JSON payload, gzip-compressing it when it is large (e.g. extracted PDF JSON)."""
+    body = json.dumps(payload).encode("utf-8")
+    headers = {"Content-Type": "application/json"}
+    if len(body) >= COMPRESS_MIN_BYTES:
+        body = gzip.compress(body)
+        headers["Content-Encoding"] = "gzip"
+    return _request("POST", endpoint, data=body, headers=headers)
+
+
+########################################
+#           Cached lookups             #
+########################################
+@st.cache_data(ttl=MARKDOWN_LIST_TTL, show_spinner=False)
+def fetch_markdown_files() -> list:
+    """Fetch Markdown files stored in S3."""
+    return _request("GET", "/fetch_markdown_files/").get("markdown_files", [])
+
+
+@st.cache_data(ttl=MARKDOWN_CONTENT_TTL, show_spinner=False)
+def get_markdown_page(markdown_filename: str, page: int) -> dict:
+    """Fetch one page of a Markdown file, with the document's total page count."""
+    return _post_json("/get_markdown_content/", {"markdown_filename": markdown_filename, "page": page})
+
+
+@st.cache_data(ttl=COST_ESTIMATE_TTL, show_spinner=False)
+def estimate_cost(payload_json: str) -> dict:
+    """Estimate token count and cost. Takes the payload as a JSON string so it can be hashed for caching."""
+    return _post_json("/estimate_cost/", json.loads(payload_json))
+
+
+########################################
+#          Uncached actions            #
+########################################
+def upload_pdf(filename: str, file_bytes: bytes) -> dict:
+    """Uploads a PDF for extraction and returns the extracted content."""
+    files = {"file": (filename, file_bytes, "application/pdf")}
+    return _request("POST", "/upload_pdf/", files=files)
+
+
+def convert_pdf_markdown(filename: str, file_bytes: bytes, update: bool = False) -> dict:
+    """
+    Converts a PDF to Markdown in S3; clears the cached Markdown list so it shows up.
+    With update=True a revised PDF replaces the existing Markdown as a new version.
+    """
+    files = {"file": (filename, file_bytes, "application/pdf")}
+    params = {"update": "true"} if update else None
+    result = _request("POST", "/convert_pdf_markdown/", files=files, params=params)
+    fetch_markdown_files.clear()
+    if update:
+        get_markdown_page.clear()
+    return result
+
+
+def chat(payload: dict) -> dict:
+    return _post_json("/chat/", payload)
+
+
+def summarize(payload: dict) -> dict:
+    return _post_json("/summarize/", payload)